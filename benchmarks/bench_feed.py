@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Benchmark home feeds: fan-out on write versus the naive follow-join query.
+
+    python benchmarks/bench_feed.py --followers 10000
+
+Seeds ``--stars`` photographers followed by every one of ``--followers``
+synthetic users, plus regular photographers each reader follows a handful
+of. Reports the cost of fanning one photo out to 10k followers, and p50/p95
+latency of a first and a deep feed page read from ``FeedEntry`` rows, with
+the stars merged in at read time, and with the ``IN (followed users)``
+query a feed would otherwise need.
+"""
+import argparse
+import random
+from collections import Counter
+
+from common import setup_django, summarize, timed
+
+
+def seed(followers, stars, regulars, follows_per_user, photos_per_user, batch_size=20000):
+    from userApp.models import CustomUser, Follow, Photo
+
+    rng = random.Random(42)
+    CustomUser.objects.bulk_create(
+        [CustomUser(username=f'star{i}', email=f'star{i}@example.com') for i in range(stars)]
+        + [CustomUser(username=f'pro{i}', email=f'pro{i}@example.com') for i in range(regulars)]
+        + [CustomUser(username=f'fan{i}', email=f'fan{i}@example.com') for i in range(followers)],
+        batch_size=batch_size,
+    )
+    star_ids = list(CustomUser.objects.filter(username__startswith='star').values_list('pk', flat=True))
+    pro_ids = list(CustomUser.objects.filter(username__startswith='pro').values_list('pk', flat=True))
+    fan_ids = list(CustomUser.objects.filter(username__startswith='fan').values_list('pk', flat=True))
+
+    # bulk_create sends no signals, so nothing is fanned out while seeding.
+    follows = []
+    for fan_id in fan_ids:
+        followed = star_ids + rng.sample(pro_ids, min(follows_per_user, len(pro_ids)))
+        follows.extend(Follow(follower_id=fan_id, following_id=pk) for pk in followed)
+    Follow.objects.bulk_create(follows, batch_size=batch_size)
+    for following_id, count in Counter(follow.following_id for follow in follows).items():
+        CustomUser.objects.filter(pk=following_id).update(follower_count=count)
+
+    photos = [
+        Photo(title=f'Photo {user_id}-{i}', image=f'photos/bench/{user_id}-{i}.jpg', photographer_id=user_id)
+        for user_id in star_ids + pro_ids for i in range(photos_per_user)
+    ]
+    Photo.objects.bulk_create(photos, batch_size=batch_size)
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE userApp_photo SET created_at = datetime('now', '-' || (id * 37) || ' seconds')"
+        )
+    print(f'  seeded {len(fan_ids):,} followers, {len(follows):,} follows, {len(photos):,} photos')
+    return star_ids, pro_ids, fan_ids
+
+
+def backfill_entries():
+    """Fan out every existing photo of fanned-out accounts, as the task would have"""
+    from userApp.feed import fan_out_photo, is_fanned_out
+    from userApp.models import Photo
+
+    photo_ids = [
+        pk for pk, follower_count in Photo.objects.values_list('pk', 'photographer__follower_count')
+        if is_fanned_out(follower_count)
+    ]
+    for pk in photo_ids:
+        fan_out_photo(pk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--followers', type=int, default=10000)
+    parser.add_argument('--stars', type=int, default=3)
+    parser.add_argument('--regulars', type=int, default=500)
+    parser.add_argument('--follows-per-user', type=int, default=20)
+    parser.add_argument('--photos-per-user', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    from django.conf import settings
+    from django.db import connection
+    from userApp.feed import fan_out_photo, feed_keys
+    from userApp.models import FeedEntry, Follow, Photo
+
+    # Stars are over the limit and read-merged; regular photographers are fanned out.
+    settings.FEED_FANOUT_MAX_FOLLOWERS = args.followers
+    print(f'Seeding into {db_path}')
+    star_ids, pro_ids, fan_ids = seed(
+        args.followers, args.stars, args.regulars, args.follows_per_user, args.photos_per_user,
+    )
+    backfill_entries()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f'  {FeedEntry.objects.count():,} feed entries')
+
+    # Fan-out cost of one photo by an account with --followers followers.
+    settings.FEED_FANOUT_MAX_FOLLOWERS = args.followers + 1
+    star_photos = list(Photo.objects.filter(photographer_id=star_ids[0]).values_list('pk', flat=True))
+    samples = []
+    for pk in star_photos[:max(1, args.repeat // 10)]:
+        samples += timed(lambda: fan_out_photo(pk), 1)
+    print(f'fan-out to {args.followers:,} followers   {summarize(samples)}')
+    FeedEntry.objects.filter(photographer_id=star_ids[0]).delete()
+    settings.FEED_FANOUT_MAX_FOLLOWERS = args.followers
+
+    rng = random.Random(7)
+    readers = rng.sample(fan_ids, min(len(fan_ids), args.repeat))
+    deep = 10
+
+    def deep_page(reader):
+        position = None
+        for _ in range(deep):
+            keys = feed_keys(reader, position, 12)
+            position = keys[-1] if keys else None
+
+    def naive(reader, offset):
+        followed = Follow.objects.filter(follower_id=reader).values('following_id')
+        queryset = Photo.objects.filter(photographer_id__in=followed, is_public=True).order_by('-created_at', '-id')
+        return list(queryset.values_list('created_at', 'id')[offset:offset + 12])
+
+    cases = [
+        ('feed, first page', lambda: feed_keys(readers[rng.randrange(len(readers))], None, 12)),
+        (f'feed, pages 1-{deep} in turn', lambda: deep_page(readers[rng.randrange(len(readers))])),
+        ('naive join, first page', lambda: naive(readers[rng.randrange(len(readers))], 0)),
+        (f'naive join, page {deep}', lambda: naive(readers[rng.randrange(len(readers))], 12 * (deep - 1))),
+    ]
+    for label, func in cases:
+        print(f'{label:<28} {summarize(timed(func, args.repeat))}')
+
+
+if __name__ == '__main__':
+    main()
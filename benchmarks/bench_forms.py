@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Benchmark the album and photo forms with a large photo table.
+
+    python benchmarks/bench_forms.py --photos 100000 --budget-ms 250
+
+Renders album_create, photo_upload and the photo autocomplete endpoint for
+a photographer who owns ``--own`` of the photos, and submits album_create
+with a few of them selected. Reports p50/p95 latency and the query count of
+each; exits non-zero if a p95 exceeds ``--budget-ms``, so it can gate CI.
+"""
+import argparse
+import random
+import sys
+
+from common import setup_django, summarize, timed
+
+
+def seed(photos, own, users, categories, batch_size=20000):
+    from userApp.models import Category, CustomUser, Photo
+
+    rng = random.Random(42)
+    CustomUser.objects.bulk_create(
+        CustomUser(username=f'user{i}', email=f'user{i}@example.com') for i in range(users)
+    )
+    Category.objects.bulk_create(Category(name=f'Category {i}') for i in range(categories))
+    viewer = CustomUser.objects.get(username='user0')
+    others = list(CustomUser.objects.exclude(pk=viewer.pk).values_list('pk', flat=True))
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+
+    created = 0
+    while created < photos:
+        batch = []
+        for i in range(created, min(photos, created + batch_size)):
+            batch.append(Photo(
+                title=f'Photo {i}',
+                image=f'photos/bench/{i}.jpg',
+                photographer_id=viewer.pk if i < own else rng.choice(others),
+                category_id=rng.choice(category_ids),
+                is_public=rng.random() > 0.1,
+            ))
+        Photo.objects.bulk_create(batch)
+        created += len(batch)
+        print(f'  seeded {created:,} photos', end='\r', flush=True)
+    print()
+
+
+def measure(name, func, repeat, budget):
+    """Time ``func``, print its latency and query count, return whether p95 is within ``budget``"""
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    # With DEBUG on, the query log is full after seeding and would hide new queries.
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        response = func()
+    assert response.status_code in (200, 302), f'{name}: HTTP {response.status_code}'
+    samples = timed(func, repeat)
+    p95 = sorted(samples)[min(len(samples) - 1, int(round(len(samples) * 0.95)) - 1)]
+    within = budget is None or p95 <= budget
+    print(f'{name:<20} {summarize(samples)}   {len(queries):3d} queries{"" if within else "   OVER BUDGET"}')
+    return within
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--photos', type=int, default=100_000)
+    parser.add_argument('--own', type=int, default=5000, help='Photos owned by the benchmarked photographer')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--budget-ms', type=float, help='Fail if any p95 exceeds this many milliseconds')
+    parser.add_argument('--db', help='Reuse an existing benchmark database instead of seeding a new one')
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    from django.db import connection
+    from django.test import Client
+    from userApp.models import CustomUser, Photo
+
+    if not args.db:
+        print(f'Seeding {args.photos:,} photos into {db_path}')
+        seed(args.photos, args.own, args.users, args.categories)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    viewer = CustomUser.objects.get(username='user0')
+    selected = list(Photo.objects.filter(photographer=viewer).values_list('pk', flat=True)[:20])
+    client = Client()
+    client.force_login(viewer)
+
+    def create_album():
+        return client.post('/album/create/', {
+            'title': 'Benchmark album', 'is_public': 'True',
+            'photos': selected, 'cover_photo': selected[0] if selected else '',
+        })
+
+    results = [
+        measure('album_create GET', lambda: client.get('/album/create/'), args.repeat, args.budget_ms),
+        measure('album_create POST', create_album, args.repeat, args.budget_ms),
+        measure('photo_upload GET', lambda: client.get('/photo/upload/'), args.repeat, args.budget_ms),
+        measure('photo_autocomplete', lambda: client.get('/photos/autocomplete/'), args.repeat, args.budget_ms),
+    ]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
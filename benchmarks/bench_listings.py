@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Benchmark photo_list for every ``sort`` value on a large synthetic catalogue.
+
+    python benchmarks/bench_listings.py --photos 1000000
+
+Reports p50/p95 latency of the first-page query for each sort, the query
+plan SQLite picks for it, and the full photo_list view.
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from common import setup_django, summarize, timed
+
+
+def seed(photos, users, categories, batch_size=20000):
+    from django.utils import timezone
+    from userApp.models import Category, CustomUser, Photo
+
+    rng = random.Random(42)
+    CustomUser.objects.bulk_create(
+        CustomUser(username=f'user{i}', email=f'user{i}@example.com') for i in range(users)
+    )
+    Category.objects.bulk_create(Category(name=f'Category {i}') for i in range(categories))
+    user_ids = list(CustomUser.objects.values_list('pk', flat=True))
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+
+    now = timezone.now()
+    created = 0
+    while created < photos:
+        batch = []
+        for i in range(created, min(photos, created + batch_size)):
+            batch.append(Photo(
+                title=f'Photo {i}',
+                image=f'photos/bench/{i}.jpg',
+                photographer_id=rng.choice(user_ids),
+                category_id=rng.choice(category_ids),
+                views=int(rng.paretovariate(1.2) * 10),
+                like_count=int(rng.paretovariate(1.5)),
+                is_public=rng.random() > 0.1,
+                created_at=now - timedelta(seconds=i * 37),
+            ))
+        Photo.objects.bulk_create(batch)
+        created += len(batch)
+        print(f'  seeded {created:,} photos', end='\r', flush=True)
+    # auto_now_add overrides created_at on insert; spread the dates out again.
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "UPDATE userApp_photo SET created_at = datetime('now', '-' || (id * 37) || ' seconds')"
+        )
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--photos', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--db', help='Reuse an existing benchmark database instead of seeding a new one')
+    args = parser.parse_args()
+
+    db_path = setup_django(args.db)
+    from django.db import connection
+    from django.test import Client
+    from userApp.models import Photo, PhotoQuerySet
+
+    if not args.db:
+        print(f'Seeding {args.photos:,} photos into {db_path}')
+        seed(args.photos, args.users, args.categories)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    client = Client()
+    for sort in PhotoQuerySet.SORTS:
+        queryset = Photo.objects.filter(is_public=True).for_grid(None).ranked(sort)[:12]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = '; '.join(row[-1] for row in cursor.fetchall())
+
+        query_samples = timed(lambda: list(queryset.all()), args.repeat)
+        view_samples = timed(lambda: client.get('/photos/', {'sort': sort}), max(1, args.repeat // 5))
+        print(f'sort={sort:<8} query  {summarize(query_samples)}')
+        print(f'{"":13} view   {summarize(view_samples)}')
+        print(f'{"":13} plan   {plan}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Shared setup for the benchmark scripts in this folder.
+
+Each benchmark runs against a throwaway SQLite database (never db.sqlite3),
+so the scripts can seed millions of rows without touching real data.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(db_path=None):
+    """Point Django at a scratch database, migrate it and return its path"""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'photography.settings')
+
+    from django.conf import settings
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='photoshare-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.ALLOWED_HOSTS = ['*']
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def timed(func, repeat):
+    """Run ``func`` ``repeat`` times and return the durations in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(len(ordered) * 0.95)) - 1)]
+    return f'p50 {statistics.median(ordered):8.2f} ms   p95 {p95:8.2f} ms   max {ordered[-1]:8.2f} ms'
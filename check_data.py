@@ -7,36 +7,24 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'photography.settings')
 django.setup()
 
-from userApp.models import CustomUser, Photo, Album, Category
-from django.db.models import Count
+from userApp.models import CustomUser, Category
+from userApp.stats import refresh_site_stats
 
 def check_database():
     """Check the current state of the database"""
     print("=== Database Status Check ===")
     
-    # Check users
-    users_count = CustomUser.objects.count()
-    print(f"Total Users: {users_count}")
-    
-    # Check categories
-    categories_count = Category.objects.count()
-    print(f"Total Categories: {categories_count}")
-    
-    # Check photos
-    photos_count = Photo.objects.count()
-    public_photos_count = Photo.objects.filter(is_public=True).count()
-    print(f"Total Photos: {photos_count}")
-    print(f"Public Photos: {public_photos_count}")
-    
-    # Check albums
-    albums_count = Album.objects.count()
-    public_albums_count = Album.objects.filter(is_public=True).count()
-    print(f"Total Albums: {albums_count}")
-    print(f"Public Albums: {public_albums_count}")
-    
-    # Check photographers (users with photos)
-    photographers_count = CustomUser.objects.filter(photos__is_public=True).distinct().count()
-    print(f"Photographers with public photos: {photographers_count}")
+    # Recount everything once; this also refreshes the snapshot the site reads
+    stats = refresh_site_stats()
+    users_count = stats.users
+    categories_count = stats.categories
+    print(f"Total Users: {stats.users}")
+    print(f"Total Categories: {stats.categories}")
+    print(f"Total Photos: {stats.photos}")
+    print(f"Public Photos: {stats.public_photos}")
+    print(f"Total Albums: {stats.albums}")
+    print(f"Public Albums: {stats.public_albums}")
+    print(f"Photographers with public photos: {stats.photographers}")
     
     print("\n=== Sample Data ===")
     
@@ -62,12 +50,13 @@ def check_database():
             print(f"Created category: {category.name}")
     
     # Show final counts
+    stats = refresh_site_stats()
     print("\n=== Final Database Status ===")
-    print(f"Total Users: {CustomUser.objects.count()}")
-    print(f"Total Categories: {Category.objects.count()}")
-    print(f"Total Photos: {Photo.objects.count()}")
-    print(f"Total Albums: {Album.objects.count()}")
-    print(f"Photographers: {CustomUser.objects.filter(photos__is_public=True).distinct().count()}")
+    print(f"Total Users: {stats.users}")
+    print(f"Total Categories: {stats.categories}")
+    print(f"Total Photos: {stats.photos}")
+    print(f"Total Albums: {stats.albums}")
+    print(f"Photographers: {stats.photographers}")
 
 if __name__ == '__main__':
     check_database() 
\ No newline at end of file
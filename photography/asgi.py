@@ -2,6 +2,10 @@
 ASGI config for photography project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serving through it runs the async like/follow endpoints on the event loop
+instead of a sync thread, e.g.:
+
+    gunicorn photography.asgi:application -k uvicorn.workers.UvicornWorker
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
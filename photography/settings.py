@@ -12,6 +12,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from decouple import config
+
+from .databases import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.humanize',
     'userApp',
     'tailwind',
     'theme',
@@ -57,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'userApp.replicas.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'photography.urls'
@@ -75,6 +81,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'userApp.context_processors.cache_versions',
             ],
         },
     },
@@ -89,12 +96,30 @@ INTERNAL_IPS = ['127.0.0.1']
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Configured from the environment (see photography/databases.py), e.g.
+#   DATABASE_URL=postgresql://photoshare:secret@db:5432/photoshare
+#   DB_CONN_MAX_AGE=60                          persistent connections, or
+#   DB_POOL=True DB_POOL_MAX_SIZE=10             a psycopg 3 connection pool
+# DATABASE_REPLICA_URL adds a read-only "replica" alias that the read-only
+# listing views query (userApp/replicas.py). Locally a second SQLite file
+# can stand in for it: DATABASE_REPLICA_URL=sqlite:///db-replica.sqlite3,
+# refreshed from db.sqlite3 with `manage.py sync_replica`.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(config('DATABASE_URL', default='sqlite:///db.sqlite3'), BASE_DIR),
 }
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = {
+        **database_config(DATABASE_REPLICA_URL, BASE_DIR),
+        # Under the test runner the replica is the test database of
+        # "default", and the router reads from the primary instead.
+        'TEST': {'MIRROR': 'default'},
+    }
+READ_REPLICA_ALIAS = 'replica' if DATABASE_REPLICA_URL else None
+DATABASE_ROUTERS = ['userApp.replicas.ReplicaRouter']
+# Seconds a client reads from the primary after one of its writes, so it
+# sees its own changes despite replication lag.
+REPLICA_PIN_SECONDS = 10
 
 
 # Password validation
@@ -147,6 +172,118 @@ STATICFILES_FINDERS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored under the SHA-256 of their content (userApp/storage.py),
+# so identical files are kept once and media URLs never change content.
+STORAGES = {
+    'default': {'BACKEND': 'userApp.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# Seconds an unreferenced media file is kept before `manage.py collect_blobs`
+# deletes it.
+BLOB_GC_GRACE = 3600
+
+# Uploads are streamed to disk and checked as they arrive
+# (userApp/uploads.py): files over UPLOAD_MAX_BYTES or with more than
+# UPLOAD_MAX_PIXELS pixels, or not recognised as an image within the first
+# UPLOAD_HEADER_PEEK bytes, are refused before they are stored or decoded.
+FILE_UPLOAD_HANDLERS = ['userApp.uploads.StreamingImageUploadHandler']
+UPLOAD_MAX_BYTES = 25 * 1024 * 1024
+UPLOAD_MAX_PIXELS = 100_000_000
+UPLOAD_HEADER_PEEK = 1024 * 1024
+# Cache holding upload counts and throughput (`manage.py upload_stats`).
+UPLOAD_METRICS_CACHE = 'default'
+
+# Image renditions generated on upload (widths in px, see userApp/renditions.py)
+PHOTO_RENDITION_WIDTHS = (320, 640, 1280)
+PROFILE_RENDITION_WIDTHS = (64, 160, 320)
+RENDITION_QUALITY = 82
+# Album cover mosaics (userApp/mosaics.py): size of the stored collage and the
+# widths of its renditions.
+ALBUM_MOSAIC_SIZE = (1200, 800)
+ALBUM_MOSAIC_WIDTHS = (400, 800)
+
+# Background task queue (userApp/tasks.py, run with `manage.py run_worker`)
+TASK_QUEUE_EAGER = False  # True runs tasks inline in the request instead
+TASK_WORKER_PROCESSES = None  # defaults to os.cpu_count()
+TASK_STALE_AFTER = 600  # seconds before a running task is assumed abandoned
+
+# Photo view counting (userApp/view_counter.py). Views are buffered in this
+# cache and written back in batches; use a shared cache backend so
+# `manage.py flush_views` can drain the buffers of every worker process.
+VIEW_COUNTER_CACHE = 'default'
+VIEW_COUNTER_FLUSH_THRESHOLD = 50  # pending views per process
+VIEW_COUNTER_FLUSH_INTERVAL = 30  # seconds
+
+# Listings with more rows than this switch from numbered ?page= links to
+# keyset ?cursor= pagination, which avoids COUNT(*) and deep OFFSET scans.
+NUMBERED_PAGINATION_MAX_ITEMS = 1200
+
+# Comments rendered with a photo; older ones load from the JSON endpoint
+# photo/<id>/comments/?cursor=... on demand.
+COMMENTS_PER_PAGE = 20
+
+# Photos per page of the album photo picker (album/<id>/picker/?q=&cursor=).
+ALBUM_PICKER_PER_PAGE = 24
+
+# Photos per page of the form photo pickers (photos/autocomplete/?q=&cursor=).
+PHOTO_AUTOCOMPLETE_PER_PAGE = 20
+
+# Tag cloud: number of tags kept in the cached aggregate, and for how long
+TAG_CLOUD_SIZE = 40
+TAG_CLOUD_CACHE_TIMEOUT = 600  # seconds
+
+# Cache backend. Defaults to per-process local memory; for a cache shared by
+# every worker point CACHE_BACKEND at
+# django.core.cache.backends.filebased.FileBasedCache (CACHE_LOCATION is a
+# directory) or django.core.cache.backends.redis.RedisCache (a redis:// URL).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='photoshare'),
+    }
+}
+
+# Anonymous page and fragment caching (userApp/caching.py). Entries are
+# invalidated by content version bumps, so timeouts only bound memory use.
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 300  # seconds
+FRAGMENT_CACHE_TIMEOUT = 600  # seconds
+
+# XML sitemaps (userApp/sitemaps.py): URLs per child sitemap (max 50,000) and
+# how long the computed sitemap index may be cached.
+SITEMAP_PAGE_SIZE = 10000
+SITEMAP_CACHE_TIMEOUT = 3600  # seconds
+
+# Site-wide counters (userApp/stats.py) are served from a snapshot row that
+# is refreshed in the background once it is older than this, or sooner after
+# changes that cannot be counted incrementally.
+SITE_STATS_MAX_AGE = 300  # seconds
+
+# Home feeds (userApp/feed.py). New photos are copied into each follower's
+# feed, except for accounts with at least this many followers, whose photos
+# are merged in when the feed is read. A new follow backfills this many of
+# the photographer's recent photos.
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+FEED_BACKFILL_SIZE = 50
+
+# Related photos (userApp/related.py), recomputed by
+# `manage.py compute_related_photos`: neighbours kept per photo, and the
+# most photos a tag, album or liker may have before it is ignored as too
+# common to say anything.
+RELATED_PHOTOS_COUNT = 12
+RELATED_MAX_FEATURE_PHOTOS = 500
+
+# Perceptual hashes (userApp/fingerprints.py) at most this many bits apart
+# count as near duplicates in `manage.py find_duplicates` (0-7; up to 3 is
+# the fastest search).
+PHASH_DUPLICATE_DISTANCE = 3
+
+# Facet counts on photo_list (userApp/facets.py): values shown per facet and
+# how long each filter combination's counts are cached (they are also
+# invalidated when photos or categories change).
+FACET_SIZE = 10
+FACET_CACHE_TIMEOUT = 300  # seconds
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -19,12 +19,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from userApp.storage import serve_media
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include("userApp.urls")),
     path("__reload__/", include("django_browser_reload.urls")),
 ]
 
-# Serve media files in development
+# Serve media files in development (content-addressed files as immutable)
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)
@@ -1,9 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Photo, Album, Category, Comment, Follow
+from .albums import rebuild_album_mosaics
+from .caching import bump
+from .counters import recount_album_photos
+from .models import CustomUser, Photo, Album, AlbumPhoto, Category, Comment, Follow, SiteStats, Tag, Task
+from .tasks import enqueue
 
 class CustomUserAdmin(UserAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'date_joined')
+    list_display = ('username', 'email', 'first_name', 'last_name', 'follower_count', 'is_staff', 'date_joined')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'date_joined')
     search_fields = ('username', 'email', 'first_name', 'last_name')
     ordering = ('-date_joined',)
@@ -15,27 +19,59 @@ class CustomUserAdmin(UserAdmin):
         ('Profile Info', {'fields': ('profile_image', 'bio', 'website', 'location')}),
     )
 
+    def save_model(self, request, obj, form, change):
+        image_changed = 'profile_image' in form.changed_data
+        if image_changed:
+            obj.profile_image_widths = []
+        super().save_model(request, obj, form, change)
+        if image_changed:
+            enqueue('user.profile_image', user_id=obj.pk)
+
 class PhotoAdmin(admin.ModelAdmin):
-    list_display = ('title', 'photographer', 'category', 'views', 'likes_count', 'is_public', 'created_at')
-    list_filter = ('is_public', 'category', 'created_at', 'photographer')
+    list_display = ('title', 'photographer', 'category', 'views', 'like_count', 'comment_count', 'is_public', 'processing_status', 'created_at')
+    list_filter = ('is_public', 'processing_status', 'category', 'created_at', 'photographer')
     search_fields = ('title', 'description', 'photographer__username', 'tags')
-    readonly_fields = ('views', 'created_at', 'updated_at')
+    readonly_fields = (
+        'views', 'like_count', 'comment_count', 'created_at', 'updated_at',
+        'camera_make', 'camera_model', 'lens', 'focal_length', 'aperture', 'exposure_time', 'iso', 'taken_at',
+        'latitude', 'longitude',
+    )
     list_editable = ('is_public',)
-    
-    def likes_count(self, obj):
-        return obj.likes.count()
-    likes_count.short_description = 'Likes'
+
+    def save_model(self, request, obj, form, change):
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            # Same as photo_edit: drop the stale renditions and reprocess the new file.
+            obj.image_widths = []
+            obj.processing_status = Photo.PROCESSING_PENDING
+        super().save_model(request, obj, form, change)
+        if image_changed:
+            enqueue('photo.process', photo_id=obj.pk)
+
+class AlbumPhotoInline(admin.TabularInline):
+    model = AlbumPhoto
+    fields = ('photo', 'position', 'added_at')
+    readonly_fields = ('added_at',)
+    raw_id_fields = ('photo',)
+    extra = 0
 
 class AlbumAdmin(admin.ModelAdmin):
     list_display = ('title', 'photographer', 'photo_count', 'is_public', 'created_at')
     list_filter = ('is_public', 'created_at', 'photographer')
     search_fields = ('title', 'description', 'photographer__username')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('photo_count', 'cover_mosaic', 'created_at', 'updated_at')
+    raw_id_fields = ('cover_photo',)
+    # Membership is edited row by row rather than with a widget listing every photo.
+    exclude = ('photos',)
+    inlines = [AlbumPhotoInline]
     list_editable = ('is_public',)
-    
-    def photo_count(self, obj):
-        return obj.get_photo_count()
-    photo_count.short_description = 'Photos'
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Inline rows are saved one by one and send no m2m_changed signal.
+        recount_album_photos([form.instance.pk])
+        rebuild_album_mosaics([form.instance.pk])
+        bump('albums')
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'photo_count', 'created_at')
@@ -46,6 +82,11 @@ class CategoryAdmin(admin.ModelAdmin):
         return obj.photos.count()
     photo_count.short_description = 'Photos'
 
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'created_at')
+    search_fields = ('name', 'slug')
+    readonly_fields = ('created_at',)
+
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('user', 'photo', 'content_preview', 'created_at')
     list_filter = ('created_at', 'user')
@@ -62,10 +103,22 @@ class FollowAdmin(admin.ModelAdmin):
     search_fields = ('follower__username', 'following__username')
     readonly_fields = ('created_at',)
 
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'updated_at')
+
+class SiteStatsAdmin(admin.ModelAdmin):
+    list_display = ('refreshed_at', 'users', 'public_photos', 'public_albums', 'photographers', 'dirty')
+    readonly_fields = ('refreshed_at',)
+
 # Register models
 admin.site.register(CustomUser, CustomUserAdmin)
 admin.site.register(Photo, PhotoAdmin)
 admin.site.register(Album, AlbumAdmin)
 admin.site.register(Category, CategoryAdmin)
+admin.site.register(Tag, TagAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Task, TaskAdmin)
+admin.site.register(SiteStats, SiteStatsAdmin)
@@ -0,0 +1,111 @@
+"""
+Album membership writes.
+
+Photos keep their place in an album in ``AlbumPhoto.position``.
+``update_album_photos()`` backs the bulk JSON endpoint: it adds, removes and
+reorders in one transaction with ``bulk_create``/``bulk_update``. Those
+writes send no m2m_changed signal, so it recounts ``photo_count``, queues
+the cover mosaic rebuild and bumps the page cache itself. Photos added
+through ``Album.photos.add()`` are moved to the end of the album by the
+receiver in ``signals.py``.
+"""
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .caching import bump
+from .counters import recount_album_photos
+from .models import Album, AlbumPhoto, Photo
+from .tasks import enqueue
+
+
+def rebuild_album_mosaics(album_ids):
+    for album_id in album_ids:
+        enqueue('album.mosaic', album_id=album_id)
+
+
+def _end_position(album_id, exclude=()):
+    end = AlbumPhoto.objects.filter(album_id=album_id).exclude(photo_id__in=exclude).aggregate(end=Max('position'))
+    return -1 if end['end'] is None else end['end']
+
+
+def append_positions(album_id, photo_ids):
+    """Move the memberships of ``photo_ids`` to the end of the album, keeping the order they were added in"""
+    start = _end_position(album_id, exclude=photo_ids) + 1
+    rows = list(AlbumPhoto.objects.filter(album_id=album_id, photo_id__in=photo_ids).order_by('id'))
+    for position, row in enumerate(rows, start):
+        row.position = position
+    AlbumPhoto.objects.bulk_update(rows, ['position'])
+
+
+def _renumber(album_id):
+    """Give every photo of the album a distinct position, keeping the current order"""
+    rows = list(AlbumPhoto.objects.filter(album_id=album_id).order_by('position', 'id'))
+    changed = []
+    for position, row in enumerate(rows):
+        if row.position != position:
+            row.position = position
+            changed.append(row)
+    AlbumPhoto.objects.bulk_update(changed, ['position'], batch_size=500)
+
+
+def _reorder(album_id, photo_ids):
+    """Put ``photo_ids`` in the given order within the positions they already hold"""
+    rows = {row.photo_id: row for row in AlbumPhoto.objects.filter(album_id=album_id, photo_id__in=photo_ids)}
+    positions = sorted(row.position for row in rows.values())
+    if len(set(positions)) < len(positions):
+        # Concurrent appends can share a position; untangle them first.
+        _renumber(album_id)
+        rows = {row.photo_id: row for row in AlbumPhoto.objects.filter(album_id=album_id, photo_id__in=photo_ids)}
+        positions = sorted(row.position for row in rows.values())
+    ordered = [rows[photo_id] for photo_id in photo_ids if photo_id in rows]
+    changed = []
+    for row, position in zip(ordered, positions):
+        if row.position != position:
+            row.position = position
+            changed.append(row)
+    AlbumPhoto.objects.bulk_update(changed, ['position'])
+    return len(changed)
+
+
+def update_album_photos(album, add=(), remove=(), order=()):
+    """
+    Change the photos of ``album`` in one transaction.
+
+    ``add`` appends the album owner's photos that are not in it yet, in the
+    given order; other ids are ignored. ``remove`` takes photos out.
+    ``order`` lists photos of the album in their new order: they swap
+    between the positions they already hold, so a client can reorder one
+    page of a large album without sending the rest. Returns
+    ``{'added': [ids], 'removed': [ids], 'moved': n}``.
+    """
+    remove = set(remove)
+    add = list(dict.fromkeys(photo_id for photo_id in add if photo_id not in remove))
+    order = list(dict.fromkeys(order))
+    with transaction.atomic():
+        # Serialises concurrent edits of one album (a no-op on SQLite, which locks the whole database).
+        Album.objects.select_for_update().filter(pk=album.pk).first()
+        removed = []
+        if remove:
+            removed = list(album.memberships.filter(photo_id__in=remove).values_list('photo_id', flat=True))
+            album.memberships.filter(photo_id__in=removed).delete()
+        added = []
+        if add:
+            owned = set(
+                Photo.objects.filter(pk__in=add, photographer_id=album.photographer_id).values_list('pk', flat=True)
+            )
+            present = set(album.memberships.filter(photo_id__in=owned).values_list('photo_id', flat=True))
+            added = [photo_id for photo_id in add if photo_id in owned and photo_id not in present]
+            start, now = _end_position(album.pk) + 1, timezone.now()
+            AlbumPhoto.objects.bulk_create([
+                AlbumPhoto(album_id=album.pk, photo_id=photo_id, position=start + offset, added_at=now)
+                for offset, photo_id in enumerate(added)
+            ])
+        moved = _reorder(album.pk, order) if order else 0
+        if added or removed:
+            recount_album_photos([album.pk])
+        if added or removed or moved:
+            rebuild_album_mosaics([album.pk])
+    if added or removed or moved:
+        bump('albums')
+    return {'added': added, 'removed': removed, 'moved': moved}
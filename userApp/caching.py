@@ -0,0 +1,136 @@
+"""
+Page and fragment caching for anonymous traffic.
+
+Cached entries are keyed on content versions. Each scope ("photos",
+"albums", ...) has a version number in the cache, and the receivers in
+``signals.py`` bump it when matching content is saved or deleted. Entries
+built from older versions are never read again and simply expire, so there
+is nothing to delete and changes show up on the next request.
+
+``cache_anonymous_page`` caches whole responses for anonymous GET requests.
+Templates cache per-card fragments with ``{% cache %}`` keyed on the
+``cache_versions`` context variable (see ``context_processors.py``).
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+SCOPES = ('photos', 'albums', 'users', 'categories')
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(scope):
+    return f'cache-version:{scope}'
+
+
+def _initial_version():
+    # A version lost to eviction restarts from the clock, never from a number
+    # that older entries may already be keyed on.
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    """Current version of each scope, in order"""
+    cache = _cache()
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_version(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Invalidate everything cached against ``scopes``"""
+    cache = _cache()
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), timeout=None)
+
+
+class CacheVersions:
+    """Lazy ``{{ cache_versions.photos }}`` lookups for template fragment keys"""
+
+    def __init__(self):
+        self._versions = {}
+
+    def __getitem__(self, scope):
+        if scope not in SCOPES:
+            raise KeyError(scope)
+        if scope not in self._versions:
+            self._versions[scope] = get_versions(scope)[0]
+        return self._versions[scope]
+
+
+def _cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pending flash messages are rendered into the page and are per visitor.
+    if 'messages' in request.COOKIES:
+        return False
+    session = getattr(request, 'session', None)
+    return not (session is not None and session.session_key and session.get('_messages'))
+
+
+def _cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not response.has_header('Vary')
+        # A rendered {% csrf_token %} is tied to this visitor's CSRF cookie.
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def cache_anonymous_page(*scopes, timeout=None):
+    """
+    Cache a view's full response for anonymous visitors.
+
+    The key combines the view, the host and full path and the versions of
+    ``scopes``; bumping any of those scopes retires every cached page that
+    depends on it.
+    """
+    def decorator(view):
+        name = f'{view.__module__}.{view.__qualname__}'
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            cache = _cache()
+            versions = '.'.join(str(version) for version in get_versions(*scopes))
+            url = hashlib.md5(f'{request.get_host()}{request.get_full_path()}'.encode()).hexdigest()
+            key = f'page:{name}:{versions}:{url}'
+
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'hit'
+                return response
+
+            response = view(request, *args, **kwargs)
+            if _cacheable_response(request, response):
+                page_timeout = timeout if timeout is not None else getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+                cache.set(key, (response.content, response['Content-Type']), page_timeout)
+                response['X-Page-Cache'] = 'miss'
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,77 @@
+"""
+Form choices that stay cheap however large the site grows.
+
+Photo pickers are limited to the requesting user's photos and rendered with
+``PhotoAutocompleteSelect``/``PhotoAutocompleteSelectMultiple``: only the
+selected photos are written into the ``<select>``, and the rest are looked
+up through the ``photo_autocomplete`` JSON endpoint as the user types.
+Validating a submission still fetches just the submitted ids.
+
+Category choices are small but shown on every upload and edit form, so
+``category_choices()`` caches them against the "categories" content version
+(see ``caching.py``).
+"""
+from django import forms
+from django.conf import settings
+from django.core.cache import caches
+from django.urls import reverse_lazy
+
+from .caching import get_versions
+from .search import search_photos
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def category_choices():
+    """``[(id, name), ...]`` of every category, by name"""
+    from .models import Category
+
+    key = 'category-choices:%s' % get_versions('categories')[0]
+    cache = _cache()
+    choices = cache.get(key)
+    if choices is None:
+        choices = list(Category.objects.order_by('name').values_list('id', 'name'))
+        cache.set(key, choices, None)
+    return choices
+
+
+def own_photos(user, query=''):
+    """``user``'s photos, public or not, narrowed by the search ``query`` if given"""
+    from .models import Photo
+
+    photos = Photo.objects.filter(photographer=user)
+    query = query.strip()
+    return search_photos(photos, query) if query else photos
+
+
+class PhotoAutocompleteMixin:
+    """Render only the selected photos; the page fetches others from ``photo_autocomplete``"""
+
+    def __init__(self, attrs=None, **kwargs):
+        attrs = {'data-autocomplete-url': reverse_lazy('userApp:photo_autocomplete'), **(attrs or {})}
+        super().__init__(attrs, **kwargs)
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [pk for pk in value if str(pk).isdigit()]
+        queryset = getattr(self.choices, 'queryset', None)
+        if queryset is None or not selected:
+            photos = []
+        else:
+            photos = queryset.filter(pk__in=selected).only('pk', 'title')
+        groups = []
+        if not self.allow_multiple_selected:
+            groups.append((None, [self.create_option(name, '', '---------', not selected, 0, attrs=attrs)], 0))
+        for index, photo in enumerate(photos, len(groups)):
+            option = self.create_option(name, photo.pk, photo.title, True, index, attrs=attrs)
+            groups.append((None, [option], index))
+        return groups
+
+
+class PhotoAutocompleteSelect(PhotoAutocompleteMixin, forms.Select):
+    pass
+
+
+class PhotoAutocompleteSelectMultiple(PhotoAutocompleteMixin, forms.SelectMultiple):
+    pass
@@ -0,0 +1,11 @@
+from django.conf import settings
+
+from .caching import CacheVersions
+
+
+def cache_versions(request):
+    """Content versions and timeout for ``{% cache %}`` fragment keys"""
+    return {
+        'cache_versions': CacheVersions(),
+        'fragment_cache_timeout': getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600),
+    }
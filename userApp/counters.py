@@ -0,0 +1,60 @@
+"""
+Recount helpers for the denormalized counter columns.
+
+Day-to-day the counters are adjusted by the receivers in ``signals.py``;
+these functions recompute them from the source tables, either for the rows
+a change touched or for everything (``manage.py recount``).
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Album, Comment, CustomUser, Follow, Photo
+
+
+def _count_of(queryset, group_field):
+    """Correlated ``COUNT(*)`` of ``queryset`` rows grouped by ``group_field``"""
+    counts = queryset.order_by().values(group_field).annotate(c=Count('*')).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def _recount(model, field, expression, pks=None):
+    """Set ``field`` to ``expression`` on rows where it has drifted; return how many were fixed"""
+    queryset = model.objects.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=list(pks))
+    drifted = queryset.annotate(actual=expression).exclude(**{field: F('actual')}).values('pk')
+    return model.objects.filter(pk__in=drifted).update(**{field: expression})
+
+
+def recount_photo_likes(photo_ids=None):
+    likes = Photo.likes.through.objects.filter(photo=OuterRef('pk'))
+    return _recount(Photo, 'like_count', _count_of(likes, 'photo'), photo_ids)
+
+
+def recount_photo_comments(photo_ids=None):
+    comments = Comment.objects.filter(photo=OuterRef('pk'))
+    return _recount(Photo, 'comment_count', _count_of(comments, 'photo'), photo_ids)
+
+
+def recount_follows(user_ids=None):
+    followers = Follow.objects.filter(following=OuterRef('pk'))
+    following = Follow.objects.filter(follower=OuterRef('pk'))
+    return (
+        _recount(CustomUser, 'follower_count', _count_of(followers, 'following'), user_ids)
+        + _recount(CustomUser, 'following_count', _count_of(following, 'follower'), user_ids)
+    )
+
+
+def recount_album_photos(album_ids=None):
+    members = Album.photos.through.objects.filter(album=OuterRef('pk'))
+    return _recount(Album, 'photo_count', _count_of(members, 'album'), album_ids)
+
+
+def recount_all():
+    """Recompute every counter; returns {counter name: rows fixed}"""
+    return {
+        'photo likes': recount_photo_likes(),
+        'photo comments': recount_photo_comments(),
+        'user follows': recount_follows(),
+        'album photos': recount_album_photos(),
+    }
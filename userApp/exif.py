@@ -0,0 +1,130 @@
+"""
+Structured camera metadata read from EXIF.
+
+``read_exif(image)`` turns a PIL image's EXIF block into the values of the
+``Photo`` fields listed in ``EXIF_FIELDS`` (camera, lens, exposure, capture
+time and GPS position). ``photo.process`` stores them on upload, and
+``manage.py extract_exif`` backfills photos uploaded before, reading files
+in parallel worker processes.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from PIL import ExifTags
+
+EXIF_FIELDS = (
+    'camera_make', 'camera_model', 'lens', 'focal_length', 'aperture', 'exposure_time', 'iso',
+    'taken_at', 'latitude', 'longitude',
+)
+# Fields are CharField(max_length=100).
+MAX_TEXT = 100
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+    if not isinstance(value, str):
+        return ''
+    return ' '.join(value.replace('\x00', ' ').split())[:MAX_TEXT]
+
+
+def _number(value):
+    if isinstance(value, (tuple, list)):
+        value = value[0] if value else None
+    try:
+        value = float(value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return value if math.isfinite(value) and value > 0 else None
+
+
+def _taken_at(value, offset):
+    """Aware datetime from EXIF ``YYYY:MM:DD HH:MM:SS`` and an optional ``+HH:MM`` offset"""
+    try:
+        taken = datetime.strptime(_text(value)[:19], '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+    offset = _text(offset)
+    if len(offset) == 6 and offset[0] in '+-':
+        try:
+            hours, minutes = int(offset[1:3]), int(offset[4:6])
+        except ValueError:
+            pass
+        else:
+            sign = -1 if offset[0] == '-' else 1
+            return taken.replace(tzinfo=dt_timezone(sign * timedelta(hours=hours, minutes=minutes)))
+    # No offset recorded: assume the site's time zone.
+    return timezone.make_aware(taken)
+
+
+def _coordinate(value, ref, limit):
+    """Signed decimal degrees from EXIF (degrees, minutes, seconds) rationals"""
+    try:
+        degrees, minutes, seconds = (float(part) for part in value)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    coordinate = degrees + minutes / 60 + seconds / 3600
+    if not math.isfinite(coordinate) or coordinate > limit:
+        return None
+    return -coordinate if _text(ref).upper() in ('S', 'W') else coordinate
+
+
+def read_exif(image):
+    """Values of ``EXIF_FIELDS`` from a PIL image; missing tags come back empty or None"""
+    exif = image.getexif()
+    details = exif.get_ifd(ExifTags.IFD.Exif)
+    gps = exif.get_ifd(ExifTags.IFD.GPSInfo)
+    Base, GPS = ExifTags.Base, ExifTags.GPS
+
+    iso = _number(details.get(Base.ISOSpeedRatings))
+    latitude = _coordinate(gps.get(GPS.GPSLatitude), gps.get(GPS.GPSLatitudeRef), 90)
+    longitude = _coordinate(gps.get(GPS.GPSLongitude), gps.get(GPS.GPSLongitudeRef), 180)
+    if latitude is None or longitude is None:
+        latitude = longitude = None
+    return {
+        'camera_make': _text(exif.get(Base.Make)),
+        'camera_model': _text(exif.get(Base.Model)),
+        'lens': _text(details.get(Base.LensModel)),
+        'focal_length': _number(details.get(Base.FocalLength)),
+        'aperture': _number(details.get(Base.FNumber)),
+        'exposure_time': _number(details.get(Base.ExposureTime)),
+        'iso': round(iso) if iso else None,
+        'taken_at': _taken_at(
+            details.get(Base.DateTimeOriginal) or exif.get(Base.DateTime), details.get(Base.OffsetTimeOriginal),
+        ),
+        'latitude': latitude,
+        'longitude': longitude,
+    }
+
+
+def camera_name(make, model):
+    """'Canon EOS R5' rather than 'Canon Canon EOS R5'"""
+    if not model:
+        return make
+    if not make or model.lower().startswith(make.split()[0].lower()):
+        return model
+    return f'{make} {model}'
+
+
+def shutter_speed(seconds):
+    if not seconds:
+        return ''
+    if seconds < 1:
+        return f'1/{round(1 / seconds)} s'
+    return f'{seconds:g} s'
+
+
+def settings_summary(values):
+    """One-line summary for ``Photo.camera_settings``, e.g. 'Canon EOS R5, 50 mm f/2.8 1/250 s ISO 100'"""
+    exposure = []
+    if values.get('focal_length'):
+        exposure.append(f"{values['focal_length']:g} mm")
+    if values.get('aperture'):
+        exposure.append(f"f/{values['aperture']:g}")
+    if values.get('exposure_time'):
+        exposure.append(shutter_speed(values['exposure_time']))
+    if values.get('iso'):
+        exposure.append(f"ISO {values['iso']}")
+    parts = [camera_name(values.get('camera_make', ''), values.get('camera_model', '')), ' '.join(exposure)]
+    return ', '.join(part for part in parts if part)
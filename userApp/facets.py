@@ -0,0 +1,162 @@
+"""
+Faceted browsing for ``photo_list``.
+
+A facet is a dimension photos can be narrowed by: category, tag, camera,
+location and date. ``facet_selection()`` reads the chosen value of each from
+the query string, ``apply_facets()`` filters the listing by them and
+``facet_counts()`` reports how many photos every value of every facet
+would leave, e.g. "Landscape (1,203)".
+
+Counts are disjunctive: a facet's own selection is ignored when counting
+its values, so picking a category still shows how many photos the other
+categories hold under the remaining filters. All facets are counted in a
+single ``UNION ALL`` of grouped queries, and the result is cached per
+filter combination against the "photos" and "categories" content
+versions (see ``caching.py``).
+"""
+import hashlib
+import json
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import CharField, Count, Exists, F, OuterRef, Value
+from django.db.models.functions import Cast, ExtractYear
+
+from .caching import get_versions
+from .models import PhotoTag
+
+FACETS = ('category', 'tag', 'camera', 'location', 'date')
+# Query parameters holding each facet's selection.
+PARAMS = {
+    'category': ('category',),
+    'tag': ('tag',),
+    'camera': ('camera',),
+    'location': ('location',),
+    'date': ('date_from', 'date_to'),
+}
+
+
+def _cache():
+    return caches[getattr(settings, 'FACET_CACHE_ALIAS', 'default')]
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def facet_selection(params):
+    """The valid facet parameters in ``params`` (a ``QueryDict``), as a plain dict"""
+    selection = {}
+    category = params.get('category', '')
+    if category.isdigit():
+        selection['category'] = category
+    for name in ('tag', 'camera', 'location'):
+        if params.get(name):
+            selection[name] = params[name]
+    for name in PARAMS['date']:
+        if _date(params.get(name)):
+            selection[name] = params[name]
+    return selection
+
+
+def _filter(photos, facet, selection):
+    if facet == 'category' and 'category' in selection:
+        return photos.filter(category_id=int(selection['category']))
+    if facet == 'tag' and 'tag' in selection:
+        return photos.filter(Exists(PhotoTag.objects.filter(photo=OuterRef('pk'), tag__slug=selection['tag'])))
+    if facet == 'camera' and 'camera' in selection:
+        return photos.filter(camera_model=selection['camera'])
+    if facet == 'location' and 'location' in selection:
+        return photos.filter(location=selection['location'])
+    if facet == 'date':
+        if 'date_from' in selection:
+            photos = photos.filter(created_at__date__gte=_date(selection['date_from']))
+        if 'date_to' in selection:
+            photos = photos.filter(created_at__date__lte=_date(selection['date_to']))
+    return photos
+
+
+def apply_facets(photos, selection, exclude=None):
+    """Narrow ``photos`` by every selected facet except ``exclude``"""
+    for facet in FACETS:
+        if facet != exclude:
+            photos = _filter(photos, facet, selection)
+    return photos
+
+
+def _grouped(photos, facet, value, label, **filters):
+    """``(facet, value, label, count)`` rows of ``photos`` grouped by ``value``"""
+    text = CharField()
+    return (
+        photos.filter(**filters).order_by()
+        .values(facet_value=Cast(value, text), facet_label=Cast(label, text))
+        .annotate(facet=Value(facet, output_field=text), count=Count('pk'))
+        .values_list('facet', 'facet_value', 'facet_label', 'count')
+    )
+
+
+def _count_query(base, selection):
+    parts = [
+        _grouped(
+            apply_facets(base, selection, 'category'), 'category', F('category_id'), F('category__name'),
+            category__isnull=False,
+        ),
+        _grouped(
+            apply_facets(base, selection, 'tag'), 'tag', F('photo_tags__tag__slug'), F('photo_tags__tag__name'),
+            photo_tags__isnull=False,
+        ),
+        _grouped(
+            apply_facets(base, selection, 'camera').exclude(camera_model=''), 'camera',
+            F('camera_model'), F('camera_model'),
+        ),
+        _grouped(apply_facets(base, selection, 'location').exclude(location=''), 'location', F('location'), F('location')),
+        _grouped(
+            apply_facets(base, selection, 'date'), 'date', ExtractYear('created_at'), ExtractYear('created_at'),
+        ),
+    ]
+    return parts[0].union(*parts[1:], all=True)
+
+
+def _cache_key(base_key, selection):
+    versions = get_versions('photos', 'categories')
+    raw = json.dumps([base_key, sorted(selection.items()), versions])
+    return 'facets:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def facet_counts(base, selection, base_key=''):
+    """
+    ``{facet: [{'value', 'label', 'count', 'selected'}, ...]}`` for the
+    photos in ``base`` (public photos after search and any non-facet
+    filters, which ``base_key`` must identify for caching).
+
+    Values are ordered by count, at most ``FACET_SIZE`` per facet, plus the
+    selected value; dates are bucketed by upload year, newest first.
+    """
+    key = _cache_key(base_key, selection)
+    cache = _cache()
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(_count_query(base, selection))
+        cache.set(key, rows, getattr(settings, 'FACET_CACHE_TIMEOUT', 300))
+
+    size = getattr(settings, 'FACET_SIZE', 10)
+    facets = {facet: [] for facet in FACETS}
+    for facet, value, label, count in rows:
+        facets[facet].append({'value': value, 'label': label, 'count': count})
+    for facet, values in facets.items():
+        if facet == 'date':
+            values.sort(key=lambda item: item['value'], reverse=True)
+            for item in values:
+                start, end = f"{item['value']}-01-01", f"{item['value']}-12-31"
+                item['date_from'], item['date_to'] = start, end
+                item['selected'] = (selection.get('date_from'), selection.get('date_to')) == (start, end)
+            continue
+        values.sort(key=lambda item: (-item['count'], item['label'].lower()))
+        for item in values:
+            item['selected'] = selection.get(facet) == item['value']
+        facets[facet] = [item for position, item in enumerate(values) if position < size or item['selected']]
+    return facets
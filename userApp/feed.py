@@ -0,0 +1,154 @@
+"""
+Home feed of photos from followed photographers.
+
+Feeds are built on write: when a photo goes public, a ``feed.fan_out`` task
+copies it into a ``FeedEntry`` row per follower, so reading a feed is one
+index range scan of the reader's own rows instead of an ``IN (followed
+users)`` join sorted by date.
+
+Photographers with ``FEED_FANOUT_MAX_FOLLOWERS`` followers or more are not
+fanned out (one upload would write that many rows). Their photos are merged
+in at read time from the photo table instead. An account that drops back
+under the limit is only fanned out for new photos; ``backfill_feed`` on
+follow covers the recent past.
+
+Feed pages are keyset paginated on ``(created_at, photo id)``, which both
+sources share, so the two can be merged page by page.
+"""
+import heapq
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import CustomUser, FeedEntry, Follow, Photo
+from .pagination import KeysetPage
+
+CURSOR_SALT = 'userApp.feed.cursor'
+FANOUT_BATCH_SIZE = 1000
+
+
+def fanout_limit():
+    return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 5000)
+
+
+def is_fanned_out(follower_count):
+    """Whether an account with ``follower_count`` followers is fanned out on write"""
+    return follower_count < fanout_limit()
+
+
+def fan_out_photo(photo_id):
+    """Add a public photo to every follower's feed; returns the rows written"""
+    photo = (
+        Photo.objects.filter(pk=photo_id, is_public=True)
+        .values('photographer_id', 'photographer__follower_count', 'created_at').first()
+    )
+    if photo is None or not is_fanned_out(photo['photographer__follower_count']):
+        return 0
+
+    followers = Follow.objects.filter(following_id=photo['photographer_id']).values_list('follower_id', flat=True)
+    written = 0
+    batch = []
+    for follower_id in followers.iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.append(FeedEntry(
+            user_id=follower_id, photo_id=photo_id,
+            photographer_id=photo['photographer_id'], created_at=photo['created_at'],
+        ))
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            written += len(FeedEntry.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    if batch:
+        written += len(FeedEntry.objects.bulk_create(batch, ignore_conflicts=True))
+    return written
+
+
+def remove_photo(photo_id):
+    """Take a photo out of every feed, e.g. when it is made private"""
+    FeedEntry.objects.filter(photo_id=photo_id).delete()
+
+
+def backfill_feed(user_id, photographer_id):
+    """Seed a new follower's feed with the photographer's recent public photos"""
+    photographer = CustomUser.objects.filter(pk=photographer_id).values_list('follower_count', flat=True).first()
+    if photographer is None or not is_fanned_out(photographer):
+        return
+    size = getattr(settings, 'FEED_BACKFILL_SIZE', 50)
+    recent = (
+        Photo.objects.filter(photographer_id=photographer_id, is_public=True)
+        .order_by('-created_at', '-id').values_list('pk', 'created_at')[:size]
+    )
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, photo_id=pk, photographer_id=photographer_id, created_at=created_at)
+         for pk, created_at in recent],
+        ignore_conflicts=True,
+    )
+
+
+def unfollow_feed(user_id, photographer_id):
+    FeedEntry.objects.filter(user_id=user_id, photographer_id=photographer_id).delete()
+
+
+def encode_cursor(created_at, photo_id):
+    return signing.dumps([created_at.isoformat(), photo_id], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """``(created_at, photo_id)`` or ``None`` for a missing or invalid cursor"""
+    if not cursor:
+        return None
+    try:
+        created_at, photo_id = signing.loads(cursor, salt=CURSOR_SALT)
+        created_at = parse_datetime(created_at)
+        photo_id = int(photo_id)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return (created_at, photo_id) if created_at else None
+
+
+def _before(position, id_field):
+    created_at, photo_id = position
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, **{f'{id_field}__lt': photo_id})
+
+
+def feed_keys(user, position=None, limit=12):
+    """
+    ``[(created_at, photo_id), ...]`` of the next ``limit`` feed items,
+    newest first, strictly after ``position``.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    if position:
+        entries = entries.filter(_before(position, 'photo_id'))
+    sources = [entries.order_by('-created_at', '-photo_id').values_list('created_at', 'photo_id')[:limit]]
+
+    pulled = list(
+        CustomUser.objects.filter(followers__follower=user, follower_count__gte=fanout_limit())
+        .values_list('pk', flat=True)
+    )
+    if pulled:
+        photos = Photo.objects.filter(photographer__in=pulled, is_public=True)
+        if position:
+            photos = photos.filter(_before(position, 'id'))
+        sources.append(photos.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit])
+
+    keys = []
+    seen = set()
+    # A photo can come from both sources if its photographer crossed the limit.
+    for key in heapq.merge(*(list(source) for source in sources), reverse=True):
+        if key[1] not in seen:
+            seen.add(key[1])
+            keys.append(key)
+            if len(keys) == limit:
+                break
+    return keys
+
+
+def feed_page(user, cursor=None, per_page=12):
+    """One ``KeysetPage`` of ``user``'s feed, photos ready for the grid"""
+    keys = feed_keys(user, decode_cursor(cursor), per_page + 1)
+    has_more = len(keys) > per_page
+    keys = keys[:per_page]
+    photos = Photo.objects.filter(pk__in=[pk for _, pk in keys], is_public=True).for_grid(user).in_bulk()
+    rows = [photos[pk] for _, pk in keys if pk in photos]
+    next_cursor = encode_cursor(*keys[-1]) if has_more else None
+    return KeysetPage(rows, next_cursor, None)
@@ -0,0 +1,213 @@
+"""
+Image fingerprints for duplicate detection.
+
+Each photo stores two fingerprints:
+
+* ``content_hash``, the SHA-256 of the file, which catches byte-identical
+  re-uploads;
+* ``phash``, a 64-bit perceptual hash (DCT of a 32x32 grayscale thumbnail,
+  low frequencies compared to their median), which stays within a few bits
+  when an image is re-encoded, resized or saved as another format.
+
+Near-duplicate search splits hashes into four 16-bit bands. Two hashes at
+most seven bits apart must agree, up to one bit, on at least one band, so
+candidates are found by exact band lookups (plus the 16 one-bit neighbours
+of each band value when the distance is over three), then confirmed with a
+full Hamming distance. It runs on sorted NumPy arrays and scales to
+millions of hashes.
+"""
+import hashlib
+
+import numpy as np
+from django.db.models import Count, Q
+from PIL import Image, ImageOps
+
+from .exif import EXIF_FIELDS
+from .models import Photo
+
+HASH_SIZE = 8
+DCT_SIZE = 32
+BANDS = 4
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+MAX_DISTANCE = 2 * BANDS - 1
+SEARCH_CHUNK = 100000
+
+
+def _dct_matrix(size):
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT = _dct_matrix(DCT_SIZE)
+
+
+def to_signed(value):
+    """Store an unsigned 64-bit hash in a signed BIGINT column"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def content_hash(file, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of an uploaded or stored file; leaves it rewound"""
+    if getattr(file, 'content_hash', None):
+        # Hashed while it was streamed in (uploads.StreamingImageUploadHandler).
+        return file.content_hash
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image):
+    """64-bit pHash of a PIL image, as a signed integer"""
+    image.draft('L', (DCT_SIZE * 2, DCT_SIZE * 2))
+    if image.mode == 'P':
+        # Palette images with transparency must go through RGBA.
+        image = image.convert('RGBA')
+    gray = ImageOps.exif_transpose(image).convert('L').resize((DCT_SIZE, DCT_SIZE), Image.Resampling.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.float64)
+    low = (DCT @ pixels @ DCT.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term is the mean brightness; leave it out of the median.
+    bits = low > np.median(low[1:])
+    return to_signed(int(np.packbits(bits).view('>u8')[0]))
+
+
+def fingerprint(file):
+    """``(content_hash, phash)`` of an image file; ``phash`` is None if Pillow cannot read it"""
+    digest = content_hash(file)
+    try:
+        with Image.open(file) as image:
+            phash = perceptual_hash(image)
+    except (OSError, ValueError):
+        phash = None
+    file.seek(0)
+    return digest, phash
+
+
+def popcount(values):
+    """Set bits per element of a uint64 array"""
+    values = values - ((values >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    values = (values & np.uint64(0x3333333333333333)) + ((values >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    values = (values + (values >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return ((values * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def hamming(a, b):
+    return popcount(np.array([a], dtype=np.int64).view(np.uint64) ^ np.array([b], dtype=np.int64).view(np.uint64))[0]
+
+
+def expand_ranges(starts, lengths):
+    """Indexes ``starts[i] .. starts[i] + lengths[i] - 1`` for every ``i``, concatenated"""
+    firsts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + np.arange(lengths.sum()) - firsts
+
+
+def similar_hashes(hashes, distance):
+    """
+    Pairs ``(i, j)``, ``i < j``, of positions in ``hashes`` at most
+    ``distance`` bits apart. ``hashes`` should hold distinct values; collapse
+    repeats with ``np.unique`` first.
+    """
+    if not 0 <= distance <= MAX_DISTANCE:
+        raise ValueError(f'distance must be between 0 and {MAX_DISTANCE}')
+    hashes = np.asarray(hashes, dtype=np.int64).view(np.uint64)
+    n = len(hashes)
+    flips = [0] + ([1 << bit for bit in range(BAND_BITS)] if distance >= BANDS else [])
+
+    found = []
+    for band in range(BANDS):
+        values = ((hashes >> np.uint64(band * BAND_BITS)) & np.uint64(BAND_MASK)).astype(np.int64)
+        order = np.argsort(values, kind='stable')
+        ordered = values[order]
+        # Chunked so candidate arrays stay a few million entries long.
+        for start in range(0, n, SEARCH_CHUNK):
+            positions = np.arange(start, min(start + SEARCH_CHUNK, n))
+            for flip in flips:
+                keys = values[positions] ^ flip
+                lo = np.searchsorted(ordered, keys, 'left')
+                lengths = np.searchsorted(ordered, keys, 'right') - lo
+                left = np.repeat(positions, lengths)
+                right = order[expand_ranges(lo, lengths)]
+                keep = left < right
+                left, right = left[keep], right[keep]
+                close = popcount(hashes[left] ^ hashes[right]) <= distance
+                found.append(left[close] * n + right[close])
+    if not found:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.unique(np.concatenate(found))
+    return pairs // n, pairs % n
+
+
+def duplicate_groups(ids, hashes, distance):
+    """Groups (lists of ``ids``, two or more each) whose hashes are chained within ``distance`` bits"""
+    ids = np.asarray(ids)
+    values, inverse = np.unique(np.asarray(hashes, dtype=np.int64), return_inverse=True)
+    parent = list(range(len(values)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(*(side.tolist() for side in similar_hashes(values, distance))):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.array([find(value) for value in range(len(values))], dtype=np.int64)
+    photo_roots = roots[inverse] if len(values) else np.empty(0, dtype=np.int64)
+    order = np.argsort(photo_roots, kind='stable')
+    groups = np.split(ids[order], np.flatnonzero(np.diff(photo_roots[order])) + 1)
+    return [group.tolist() for group in groups if len(group) > 1]
+
+
+def reuse_image(photo, original):
+    """Point ``photo`` at ``original``'s stored file and renditions instead of saving a copy"""
+    photo.image = original.image.name
+    photo.image_widths = list(original.image_widths)
+    photo.width, photo.height = original.width, original.height
+    for field in EXIF_FIELDS:
+        setattr(photo, field, getattr(original, field))
+    photo.exif_scanned = original.exif_scanned
+    photo.processing_status = Photo.PROCESSING_READY
+
+
+def backfill_fingerprints(chunk_size=500):
+    """Fingerprint stored photos that predate fingerprints; returns how many were updated"""
+    updated = 0
+    missing = Photo.objects.filter(Q(phash__isnull=True) | Q(content_hash='')).exclude(image='')
+    for photo in missing.only('pk', 'image').iterator(chunk_size=chunk_size):
+        storage = photo.image.storage
+        if not storage.exists(photo.image.name):
+            continue
+        with storage.open(photo.image.name, 'rb') as fh:
+            digest, phash = fingerprint(fh)
+        updated += Photo.objects.filter(pk=photo.pk).update(content_hash=digest, phash=phash)
+    return updated
+
+
+def exact_duplicates():
+    """Groups of photo ids whose files are byte-identical"""
+    hashes = (
+        Photo.objects.exclude(content_hash='').values('content_hash')
+        .annotate(copies=Count('*')).filter(copies__gt=1).values_list('content_hash', flat=True)
+    )
+    groups = {}
+    for digest, pk in Photo.objects.filter(content_hash__in=hashes).order_by('pk').values_list('content_hash', 'pk'):
+        groups.setdefault(digest, []).append(pk)
+    return list(groups.values())
+
+
+def near_duplicates(distance):
+    """Groups of photo ids whose perceptual hashes chain within ``distance`` bits"""
+    rows = Photo.objects.filter(phash__isnull=False).order_by('pk').values_list('pk', 'phash')
+    values = np.fromiter(
+        (value for row in rows.iterator(chunk_size=10000) for value in row), dtype=np.int64,
+    ).reshape(-1, 2)
+    return duplicate_groups(values[:, 0], values[:, 1], distance)
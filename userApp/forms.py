@@ -1,6 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from .choices import PhotoAutocompleteSelect, PhotoAutocompleteSelectMultiple, category_choices
+from .fingerprints import fingerprint
 from .models import CustomUser, Photo, Album, Comment
+from .uploads import UploadImageField
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -16,6 +19,7 @@ class UserProfileForm(forms.ModelForm):
         widgets = {
             'bio': forms.Textarea(attrs={'rows': 4}),
         }
+        field_classes = {'profile_image': UploadImageField}
 
 class PhotoUploadForm(forms.ModelForm):
     class Meta:
@@ -27,6 +31,34 @@ class PhotoUploadForm(forms.ModelForm):
             'location': forms.TextInput(attrs={'placeholder': 'City, Country'}),
             'camera_settings': forms.TextInput(attrs={'placeholder': 'Camera, lens, settings'}),
         }
+        field_classes = {'image': UploadImageField}
+
+    def __init__(self, *args, photographer=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.photographer = photographer
+        self.fingerprint = None
+        category = self.fields['category']
+        # Rendered from the cache; a submitted category is still checked against the table.
+        category.choices = [('', category.empty_label), *category_choices()]
+        self.duplicate_of = None
+
+    def clean_image(self):
+        """Fingerprint a new upload; refuse exact copies of the uploader's own photos"""
+        image = self.cleaned_data.get('image')
+        if not image or 'image' not in self.changed_data:
+            return image
+        self.fingerprint = fingerprint(image)
+        copies = Photo.objects.filter(content_hash=self.fingerprint[0]).exclude(pk=self.instance.pk)
+        if self.photographer is not None:
+            own = copies.filter(photographer=self.photographer).first()
+            if own is not None:
+                raise forms.ValidationError(
+                    'You have already uploaded this image as "%(title)s".',
+                    code='duplicate', params={'title': own.title},
+                )
+        # Someone else's identical, processed file can be reused as-is.
+        self.duplicate_of = copies.filter(processing_status=Photo.PROCESSING_READY).exclude(image='').first()
+        return image
 
 class AlbumForm(forms.ModelForm):
     class Meta:
@@ -34,9 +66,18 @@ class AlbumForm(forms.ModelForm):
         fields = ['title', 'description', 'cover_photo', 'photos', 'is_public']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
-            'photos': forms.CheckboxSelectMultiple(),
+            'cover_photo': PhotoAutocompleteSelect(),
+            'photos': PhotoAutocompleteSelectMultiple(),
         }
 
+    def __init__(self, *args, photographer=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the photographer's own photos can be picked, and the widgets
+        # render just the selected ones.
+        photos = Photo.objects.filter(photographer=photographer) if photographer else Photo.objects.none()
+        self.fields['cover_photo'].queryset = photos
+        self.fields['photos'].queryset = photos
+
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
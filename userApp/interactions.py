@@ -0,0 +1,83 @@
+"""
+Like and follow writes for the JSON endpoints.
+
+The toggles try the delete first and only insert when nothing was deleted,
+so a toggle costs one DELETE plus, for a new like or follow, one INSERT.
+Like rows are written through the M2M table directly, which sends no
+m2m_changed signal, so these functions adjust ``like_count`` and bump the
+page cache themselves. Follows still go through the model, and its
+receivers keep the follower counts.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .caching import bump
+from .counters import recount_photo_likes
+from .models import CustomUser, Follow, Photo
+
+MAX_BULK_IDS = 100
+
+Like = Photo.likes.through
+
+
+def toggle_like(user_id, photo_id):
+    """Like or unlike ``photo_id``; returns ``(liked, like_count)``"""
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(photo_id=photo_id, customuser_id=user_id).delete()
+        if deleted:
+            Photo.objects.filter(pk=photo_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+            liked = False
+        else:
+            if not Photo.objects.filter(pk=photo_id).update(like_count=F('like_count') + 1):
+                raise Photo.DoesNotExist
+            try:
+                with transaction.atomic():
+                    Like.objects.create(photo_id=photo_id, customuser_id=user_id)
+            except IntegrityError:
+                # A concurrent request liked it first; keep its count.
+                Photo.objects.filter(pk=photo_id).update(like_count=F('like_count') - 1)
+            liked = True
+        like_count = Photo.objects.filter(pk=photo_id).values_list('like_count', flat=True).get()
+    bump('photos')
+    return liked, like_count
+
+
+def set_likes(user_id, like_ids=(), unlike_ids=()):
+    """
+    Idempotently like ``like_ids`` and unlike ``unlike_ids``.
+
+    Unknown photo ids are ignored. Returns ``{photo_id: like_count}`` for
+    every photo that exists.
+    """
+    like_ids = set(like_ids) - set(unlike_ids)
+    unlike_ids = set(unlike_ids)
+    with transaction.atomic():
+        if unlike_ids:
+            Like.objects.filter(customuser_id=user_id, photo_id__in=unlike_ids).delete()
+        existing = set(Photo.objects.filter(pk__in=like_ids).values_list('pk', flat=True)) if like_ids else set()
+        Like.objects.bulk_create(
+            [Like(photo_id=photo_id, customuser_id=user_id) for photo_id in existing], ignore_conflicts=True,
+        )
+        touched = existing | unlike_ids
+        if touched:
+            recount_photo_likes(touched)
+    bump('photos')
+    return dict(Photo.objects.filter(pk__in=touched).values_list('pk', 'like_count'))
+
+
+def toggle_follow(follower_id, username):
+    """Follow or unfollow ``username``; returns ``(is_following, follower_count)``"""
+    following_id = CustomUser.objects.filter(username=username).values_list('pk', flat=True).get()
+    if following_id == follower_id:
+        raise ValueError('You cannot follow yourself')
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(follower_id=follower_id, following_id=following_id).delete()
+        is_following = not deleted
+        if is_following:
+            try:
+                with transaction.atomic():
+                    Follow.objects.create(follower_id=follower_id, following_id=following_id)
+            except IntegrityError:
+                pass
+        follower_count = CustomUser.objects.filter(pk=following_id).values_list('follower_count', flat=True).get()
+    return is_following, follower_count
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from userApp.storage import collect_blobs
+
+
+class Command(BaseCommand):
+    help = 'Delete media files no photo or profile references any more (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, help='Seconds a file must have been unreferenced (default BLOB_GC_GRACE)')
+
+    def handle(self, *args, **options):
+        collected = collect_blobs(options['grace'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {collected} unreferenced media files'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from userApp.related import compute_related_photos
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related photos shown on photo pages (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, help='Related photos to keep per photo (default RELATED_PHOTOS_COUNT)')
+
+    def handle(self, *args, **options):
+        written = compute_related_photos(options['count'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} related photo links'))
@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from userApp.caching import bump
+from userApp.exif import EXIF_FIELDS, settings_summary
+from userApp.models import Photo
+from userApp.worker import init_worker, read_stored_exif
+
+
+class Command(BaseCommand):
+    help = 'Read camera, lens, exposure, capture time and GPS from the EXIF of existing photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help='Worker processes reading files (default: one per CPU; 1 reads in this process)',
+        )
+        parser.add_argument('--all', action='store_true', help='Re-read photos that were already scanned')
+        parser.add_argument('--batch-size', type=int, default=500, help='Photos written per UPDATE batch')
+
+    def handle(self, *args, **options):
+        photos = Photo.objects.exclude(image='')
+        if not options['all']:
+            photos = photos.filter(exif_scanned=False)
+        jobs = list(photos.order_by('pk').values_list('pk', 'image'))
+        if not jobs:
+            self.stdout.write(self.style.SUCCESS('No photos to scan'))
+            return
+
+        processes = max(1, min(options['processes'], len(jobs)))
+        if processes == 1:
+            results = (read_stored_exif(pk, name) for pk, name in jobs)
+            self.save(results, options['batch_size'])
+        else:
+            self.stdout.write(f'Reading {len(jobs)} photos with {processes} processes')
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker) as pool:
+                ids, names = zip(*jobs)
+                self.save(pool.map(read_stored_exif, ids, names, chunksize=32), options['batch_size'])
+
+    def save(self, results, batch_size):
+        scanned = failed = 0
+        batch = []
+        for pk, values in results:
+            if values is None:
+                failed += 1
+                self.stderr.write(f'Photo {pk}: could not read image')
+                continue
+            batch.append((pk, values))
+            if len(batch) >= batch_size:
+                scanned += self.write(batch)
+                batch = []
+        if batch:
+            scanned += self.write(batch)
+        bump('photos')
+        self.stdout.write(self.style.SUCCESS(f'Read EXIF from {scanned} photos ({failed} unreadable)'))
+
+    def write(self, batch):
+        photos = [Photo(pk=pk, exif_scanned=True, **values) for pk, values in batch]
+        Photo.objects.bulk_update(photos, [*EXIF_FIELDS, 'exif_scanned'])
+        for pk, values in batch:
+            summary = settings_summary(values)
+            if summary:
+                Photo.objects.filter(pk=pk, camera_settings='').update(camera_settings=summary[:200])
+        return len(photos)
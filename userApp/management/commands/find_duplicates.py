@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from userApp.fingerprints import MAX_DISTANCE, backfill_fingerprints, exact_duplicates, near_duplicates
+from userApp.models import Photo
+
+
+class Command(BaseCommand):
+    help = 'List groups of duplicate and near-duplicate photos by content and perceptual hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--distance', type=int, default=getattr(settings, 'PHASH_DUPLICATE_DISTANCE', 3),
+            help=f'Maximum perceptual hash distance in bits, 0-{MAX_DISTANCE} (default PHASH_DUPLICATE_DISTANCE)',
+        )
+        parser.add_argument('--exact', action='store_true', help='Only report byte-identical files')
+        parser.add_argument('--backfill', action='store_true', help='Fingerprint photos that have no hashes yet first')
+        parser.add_argument('--limit', type=int, default=50, help='Groups to print (default 50)')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['distance'] <= MAX_DISTANCE:
+            raise CommandError(f'--distance must be between 0 and {MAX_DISTANCE}')
+        if options['backfill']:
+            self.stdout.write(f'Fingerprinted {backfill_fingerprints()} photos')
+
+        groups = exact_duplicates() if options['exact'] else near_duplicates(options['distance'])
+        groups.sort(key=len, reverse=True)
+        shown = groups[:options['limit']]
+        photos = Photo.objects.select_related('photographer').in_bulk([pk for group in shown for pk in group])
+        for number, group in enumerate(shown, 1):
+            self.stdout.write(f'Group {number} ({len(group)} photos):')
+            for pk in group:
+                photo = photos[pk]
+                self.stdout.write(f'  #{pk} "{photo.title}" by {photo.photographer.username} ({photo.image.name})')
+
+        copies = sum(len(group) - 1 for group in groups)
+        self.stdout.write(self.style.SUCCESS(f'{len(groups)} duplicate groups, {copies} redundant photos'))
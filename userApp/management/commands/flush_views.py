@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from userApp.view_counter import flush_all
+
+
+class Command(BaseCommand):
+    help = 'Write buffered photo view counts to the database (run on shutdown)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Photos per cache lookup')
+
+    def handle(self, *args, **options):
+        written = flush_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Flushed {written} buffered views'))
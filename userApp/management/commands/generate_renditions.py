@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from userApp.models import CustomUser, Photo
+from userApp.renditions import generate_photo_renditions, generate_profile_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generate missing image renditions for existing photos and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that already exist')
+
+    def handle(self, *args, **options):
+        force = options['force']
+
+        photos = Photo.objects.exclude(image='')
+        if not force:
+            photos = photos.filter(image_widths=[])
+        done = 0
+        for photo in photos.iterator():
+            try:
+                generate_photo_renditions(photo)
+                done += 1
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'Photo {photo.pk} ({photo.image.name}): {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Generated renditions for {done} photos'))
+
+        users = CustomUser.objects.exclude(profile_image='').exclude(profile_image__isnull=True)
+        if not force:
+            users = users.filter(profile_image_widths=[])
+        done = 0
+        for user in users.iterator():
+            try:
+                generate_profile_renditions(user)
+                done += 1
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'User {user.pk} ({user.profile_image.name}): {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Generated renditions for {done} profile images'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from userApp.albums import rebuild_album_mosaics
+from userApp.models import Album
+
+
+class Command(BaseCommand):
+    help = 'Queue a cover mosaic rebuild for every album (e.g. albums created before mosaics existed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Only albums that have no mosaic yet')
+
+    def handle(self, *args, **options):
+        albums = Album.objects.order_by('pk')
+        if options['missing']:
+            albums = albums.filter(cover_mosaic='')
+        album_ids = list(albums.values_list('pk', flat=True))
+        rebuild_album_mosaics(album_ids)
+        self.stdout.write(self.style.SUCCESS(f'Queued mosaic rebuilds for {len(album_ids)} albums'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from userApp.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text photo search index from the photo table'
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} photos'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from userApp.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized like, comment, follower and album photo counters'
+
+    def handle(self, *args, **options):
+        for counter, fixed in recount_all().items():
+            self.stdout.write(f'{counter}: {fixed} rows corrected')
+        self.stdout.write(self.style.SUCCESS('Counters are up to date'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from userApp.stats import refresh_site_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the site-wide statistics snapshot (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        stats = refresh_site_stats()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{stats.public_photos} public photos, {stats.public_albums} public albums, '
+                f'{stats.photographers} photographers, {stats.users} users'
+            )
+        )
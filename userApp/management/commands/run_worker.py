@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from userApp.tasks import claim_tasks, requeue_stale
+from userApp.worker import execute, init_worker
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks (image renditions, metadata, hashing) from the task queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int,
+            default=getattr(settings, 'TASK_WORKER_PROCESSES', None) or os.cpu_count() or 1,
+            help='Number of worker processes',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between queue polls when idle')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        poll_interval = options['poll_interval']
+
+        stale = requeue_stale(timedelta(seconds=getattr(settings, 'TASK_STALE_AFTER', 600)))
+        if stale:
+            self.stdout.write(f'Re-queued {stale} stale tasks')
+
+        self.stdout.write(f'Worker started with {processes} processes')
+        context = multiprocessing.get_context('spawn')
+        completed = failed = 0
+        running = set()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker) as pool:
+            try:
+                while True:
+                    free = processes - len(running)
+                    if free > 0:
+                        for task_id in claim_tasks(free):
+                            running.add(pool.submit(execute, task_id))
+
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                        continue
+
+                    done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            ok = future.result()
+                        except Exception as exc:
+                            ok = False
+                            self.stderr.write(f'Worker process error: {exc}')
+                        if ok:
+                            completed += 1
+                        else:
+                            failed += 1
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping worker, waiting for running tasks...')
+                wait(running)
+
+        self.stdout.write(self.style.SUCCESS(f'Worker finished: {completed} succeeded, {failed} failed'))
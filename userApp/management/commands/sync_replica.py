@@ -0,0 +1,15 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from userApp.replicas import sync_sqlite_replica
+
+
+class Command(BaseCommand):
+    help = 'Copy the SQLite database into the local SQLite read replica (run whenever the replica should catch up)'
+
+    def handle(self, *args, **options):
+        try:
+            path = sync_sqlite_replica()
+        except ImproperlyConfigured as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(f'Replica {path} is up to date'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from userApp.uploads import reset_upload_metrics, upload_metrics
+
+
+class Command(BaseCommand):
+    help = 'Report upload counts and receive throughput by outcome since the last reset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Clear the counters after reporting')
+
+    def handle(self, *args, **options):
+        for outcome, metrics in upload_metrics().items():
+            throughput = metrics['throughput']
+            rate = f'{filesizeformat(throughput)}/s' if throughput is not None else '-'
+            self.stdout.write(
+                f"{outcome:<16} {metrics['count']:>8} uploads  {filesizeformat(metrics['bytes']):>10}  {rate}"
+            )
+        if options['reset']:
+            reset_upload_metrics()
+        self.stdout.write(self.style.SUCCESS('Done'))
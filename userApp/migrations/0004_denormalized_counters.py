@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:08
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count_of(queryset, group_field):
+    counts = queryset.order_by().values(group_field).annotate(c=Count('*')).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Photo = apps.get_model('userApp', 'Photo')
+    Album = apps.get_model('userApp', 'Album')
+    Comment = apps.get_model('userApp', 'Comment')
+    CustomUser = apps.get_model('userApp', 'CustomUser')
+    Follow = apps.get_model('userApp', 'Follow')
+
+    Photo.objects.update(
+        like_count=_count_of(Photo.likes.through.objects.filter(photo=OuterRef('pk')), 'photo'),
+        comment_count=_count_of(Comment.objects.filter(photo=OuterRef('pk')), 'photo'),
+    )
+    CustomUser.objects.update(
+        follower_count=_count_of(Follow.objects.filter(following=OuterRef('pk')), 'following'),
+        following_count=_count_of(Follow.objects.filter(follower=OuterRef('pk')), 'follower'),
+    )
+    Album.objects.update(
+        photo_count=_count_of(Album.photos.through.objects.filter(album=OuterRef('pk')), 'album'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0003_task_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='photo_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
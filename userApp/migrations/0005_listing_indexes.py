@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0004_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['created_at'], name='photo_public_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['views', 'like_count'], name='photo_public_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['like_count', 'created_at'], name='photo_public_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['category', 'created_at'], name='photo_cat_public_created_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(allow_unicode=True, max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PhotoTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_tags', to='userApp.photo')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_tags', to='userApp.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='tag_set',
+            field=models.ManyToManyField(blank=True, related_name='photos', through='userApp.PhotoTag', to='userApp.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='phototag',
+            index=models.Index(fields=['tag', 'photo'], name='phototag_tag_photo_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='phototag',
+            unique_together={('photo', 'tag')},
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def populate_tags(apps, schema_editor):
+    from userApp.tagging import parse_tags
+
+    Photo = apps.get_model('userApp', 'Photo')
+    Tag = apps.get_model('userApp', 'Tag')
+    PhotoTag = apps.get_model('userApp', 'PhotoTag')
+
+    photo_slugs = {}
+    names = {}
+    for photo_id, tags in Photo.objects.exclude(tags='').values_list('pk', 'tags').iterator(chunk_size=2000):
+        parsed = parse_tags(tags)
+        photo_slugs[photo_id] = [slug for _, slug in parsed]
+        for name, slug in parsed:
+            names.setdefault(slug, name)
+
+    Tag.objects.bulk_create(
+        [Tag(name=name, slug=slug) for slug, name in names.items()], batch_size=1000, ignore_conflicts=True,
+    )
+    tag_ids = dict(Tag.objects.values_list('slug', 'pk'))
+    PhotoTag.objects.bulk_create(
+        [
+            PhotoTag(photo_id=photo_id, tag_id=tag_ids[slug])
+            for photo_id, slugs in photo_slugs.items()
+            for slug in slugs
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0007_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
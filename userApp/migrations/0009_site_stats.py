@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0008_populate_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('categories', models.PositiveIntegerField(default=0)),
+                ('photos', models.PositiveIntegerField(default=0)),
+                ('public_photos', models.PositiveIntegerField(default=0)),
+                ('albums', models.PositiveIntegerField(default=0)),
+                ('public_albums', models.PositiveIntegerField(default=0)),
+                ('photographers', models.PositiveIntegerField(default=0, help_text='Users with at least one public photo')),
+                ('dirty', models.BooleanField(default=False)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'site stats',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0010_feed_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPhoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='userApp.photo')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_in', to='userApp.photo')),
+            ],
+            options={
+                'ordering': ['photo', 'rank'],
+                'unique_together': {('photo', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0011_related_photos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='phash',
+            field=models.BigIntegerField(blank=True, db_index=True, editable=False, help_text='64-bit perceptual hash', null=True),
+        ),
+    ]
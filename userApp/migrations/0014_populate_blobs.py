@@ -0,0 +1,29 @@
+from collections import Counter
+
+from django.db import migrations
+
+
+def populate_blobs(apps, schema_editor):
+    Photo = apps.get_model('userApp', 'Photo')
+    CustomUser = apps.get_model('userApp', 'CustomUser')
+    Blob = apps.get_model('userApp', 'Blob')
+
+    counts = Counter(Photo.objects.exclude(image='').values_list('image', flat=True).iterator(chunk_size=2000))
+    counts.update(
+        CustomUser.objects.exclude(profile_image='').exclude(profile_image__isnull=True)
+        .values_list('profile_image', flat=True).iterator(chunk_size=2000)
+    )
+    Blob.objects.bulk_create(
+        [Blob(name=name, refcount=refcount) for name, refcount in counts.items()], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0013_blobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_blobs, migrations.RunPython.noop),
+    ]
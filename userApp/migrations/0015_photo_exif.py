@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0014_populate_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='aperture',
+            field=models.FloatField(blank=True, editable=False, help_text='f-number', null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='camera_make',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='camera_model',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='exif_scanned',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='exposure_time',
+            field=models.FloatField(blank=True, editable=False, help_text='seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='focal_length',
+            field=models.FloatField(blank=True, editable=False, help_text='mm', null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='iso',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='lens',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='taken_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['camera_model', 'created_at'], name='photo_public_camera_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['lens', 'created_at'], name='photo_public_lens_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['iso'], name='photo_public_iso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['taken_at'], name='photo_public_taken_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0015_photo_exif'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['photo', '-created_at', '-id'], name='comment_photo_created_idx'),
+        ),
+    ]
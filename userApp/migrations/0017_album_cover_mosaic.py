@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0016_comment_photo_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='cover_mosaic',
+            field=models.ImageField(blank=True, editable=False, upload_to='albums/mosaics/'),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='cover_mosaic_widths',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def number_positions(apps, schema_editor):
+    AlbumPhoto = apps.get_model('userApp', 'AlbumPhoto')
+    rows, album_id, position = [], None, 0
+    for row in AlbumPhoto.objects.order_by('album_id', 'id').iterator(chunk_size=2000):
+        position = position + 1 if row.album_id == album_id else 0
+        album_id = row.album_id
+        row.position = position
+        rows.append(row)
+    AlbumPhoto.objects.bulk_update(rows, ['position'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userApp', '0017_album_cover_mosaic'),
+    ]
+
+    operations = [
+        # The automatic album_photos table becomes the AlbumPhoto model:
+        # declare it over the existing table, then add the new columns.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='AlbumPhoto',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('album', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='userApp.album')),
+                        ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='album_memberships', to='userApp.photo')),
+                    ],
+                    options={
+                        'db_table': 'userApp_album_photos',
+                        'unique_together': {('album', 'photo')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='album',
+                    name='photos',
+                    field=models.ManyToManyField(blank=True, related_name='albums', through='userApp.AlbumPhoto', to='userApp.photo'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='albumphoto',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='albumphoto',
+            name='added_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterModelTable(
+            name='albumphoto',
+            table=None,
+        ),
+        migrations.AlterModelOptions(
+            name='albumphoto',
+            options={'ordering': ['album', 'position', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='albumphoto',
+            index=models.Index(fields=['album', 'position', 'id'], name='albumphoto_position_idx'),
+        ),
+        migrations.RunPython(number_positions, migrations.RunPython.noop),
+    ]
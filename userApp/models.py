@@ -1,18 +1,30 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Q, Value
 from django.utils import timezone
 
+from .exif import camera_name, shutter_speed
+from .renditions import RenditionSet
+from .tagging import TAG_NAME_MAX_LENGTH, parse_tags
+
 class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     profile_image = models.ImageField(upload_to='users/profiles/', blank=True, null=True)
+    profile_image_widths = models.JSONField(default=list, blank=True, editable=False)
     bio = models.TextField(blank=True)
     website = models.URLField(blank=True)
     location = models.CharField(max_length=100, blank=True)
     date_joined = models.DateTimeField(auto_now_add=True)
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.username
 
+    @property
+    def profile_image_renditions(self):
+        return RenditionSet(self.profile_image, self.profile_image_widths)
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -24,33 +36,180 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+class PhotoQuerySet(models.QuerySet):
+    # Listing sort orders. Each one ends in a unique column so pages are
+    # stable, and leads with a column covered by one of Photo.Meta.indexes.
+    SORTS = {
+        'newest': ('-created_at', '-id'),
+        'oldest': ('created_at', 'id'),
+        'popular': ('-views', '-like_count', '-id'),
+        'liked': ('-like_count', '-created_at', '-id'),
+    }
+    DEFAULT_SORT = 'newest'
+    # Album order, over the annotations added by in_album().
+    ALBUM_ORDERING = ('album_position', 'membership_id')
+
+    @classmethod
+    def sort_ordering(cls, sort):
+        """``order_by()`` fields for ``sort`` (unknown values fall back to newest)"""
+        return cls.SORTS.get(sort, cls.SORTS[cls.DEFAULT_SORT])
+
+    def ranked(self, sort):
+        """Order by one of ``SORTS``"""
+        return self.order_by(*self.sort_ordering(sort))
+
+    def with_is_liked(self, viewer):
+        if viewer is None or not viewer.is_authenticated:
+            return self.annotate(is_liked=Value(False))
+        return self.annotate(is_liked=Exists(
+            Photo.likes.through.objects.filter(photo=OuterRef('pk'), customuser=viewer.pk)
+        ))
+
+    def in_album(self, album):
+        """Photos of ``album`` in album order, annotated with their ``AlbumPhoto`` position and id"""
+        return self.filter(album_memberships__album=album).annotate(
+            album_position=F('album_memberships__position'), membership_id=F('album_memberships__id'),
+        ).order_by(*self.ALBUM_ORDERING)
+
+    def for_grid(self, viewer=None):
+        """
+        Everything a photo card renders in one query: photographer and
+        category joined and the viewer's liked flag annotated. Like and
+        comment counts are denormalized columns (see signals.py), so
+        templates never hit the database per card.
+        """
+        return self.select_related('photographer', 'category').with_is_liked(viewer)
+
+
 class Photo(models.Model):
+    PROCESSING_PENDING = 'pending'
+    PROCESSING_RUNNING = 'processing'
+    PROCESSING_READY = 'ready'
+    PROCESSING_FAILED = 'failed'
+    PROCESSING_STATUS_CHOICES = [
+        (PROCESSING_PENDING, 'Pending'),
+        (PROCESSING_RUNNING, 'Processing'),
+        (PROCESSING_READY, 'Ready'),
+        (PROCESSING_FAILED, 'Failed'),
+    ]
+
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='photos/')
+    image_widths = models.JSONField(default=list, blank=True, editable=False)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
+    phash = models.BigIntegerField(null=True, blank=True, db_index=True, editable=False, help_text="64-bit perceptual hash")
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES, default=PROCESSING_READY)
     photographer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='photos')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='photos')
     tags = models.CharField(max_length=500, blank=True, help_text="Comma-separated tags")
     location = models.CharField(max_length=200, blank=True)
     camera_settings = models.CharField(max_length=200, blank=True, help_text="Camera, lens, settings")
+    # Read from the image's EXIF by the photo.process task (see exif.py).
+    camera_make = models.CharField(max_length=100, blank=True, editable=False)
+    camera_model = models.CharField(max_length=100, blank=True, editable=False)
+    lens = models.CharField(max_length=100, blank=True, editable=False)
+    focal_length = models.FloatField(null=True, blank=True, editable=False, help_text="mm")
+    aperture = models.FloatField(null=True, blank=True, editable=False, help_text="f-number")
+    exposure_time = models.FloatField(null=True, blank=True, editable=False, help_text="seconds")
+    iso = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    taken_at = models.DateTimeField(null=True, blank=True, editable=False)
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    exif_scanned = models.BooleanField(default=False, editable=False)
+    tag_set = models.ManyToManyField('Tag', through='PhotoTag', related_name='photos', blank=True)
     likes = models.ManyToManyField(CustomUser, related_name='liked_photos', blank=True)
     views = models.PositiveIntegerField(default=0)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PhotoQuerySet.as_manager()
+
+    class Meta:
+        # Partial indexes on public photos back the listing sorts. Django
+        # renders filter(is_public=True) as a bare boolean predicate, which
+        # SQLite will not match against an (is_public, ...) composite index
+        # but does match against an index with the same WHERE clause.
+        indexes = [
+            models.Index(fields=['created_at'], condition=Q(is_public=True), name='photo_public_created_idx'),
+            models.Index(fields=['views', 'like_count'], condition=Q(is_public=True), name='photo_public_views_idx'),
+            models.Index(fields=['like_count', 'created_at'], condition=Q(is_public=True), name='photo_public_likes_idx'),
+            models.Index(
+                fields=['category', 'created_at'], condition=Q(is_public=True), name='photo_cat_public_created_idx',
+            ),
+            models.Index(
+                fields=['camera_model', 'created_at'], condition=Q(is_public=True), name='photo_public_camera_idx',
+            ),
+            models.Index(fields=['lens', 'created_at'], condition=Q(is_public=True), name='photo_public_lens_idx'),
+            models.Index(fields=['iso'], condition=Q(is_public=True), name='photo_public_iso_idx'),
+            models.Index(fields=['taken_at'], condition=Q(is_public=True), name='photo_public_taken_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
     def get_tags_list(self):
-        return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
+        return [name for name, _ in parse_tags(self.tags)]
+
+    @property
+    def tag_links(self):
+        """Tags with their page slugs, parsed from ``tags`` without a query"""
+        return [{'name': name, 'slug': slug} for name, slug in parse_tags(self.tags)]
+
+    @property
+    def image_renditions(self):
+        return RenditionSet(self.image, self.image_widths)
+
+    @property
+    def camera(self):
+        return camera_name(self.camera_make, self.camera_model)
+
+    @property
+    def shutter_speed(self):
+        return shutter_speed(self.exposure_time)
+
+    @property
+    def is_processing(self):
+        return self.processing_status in (self.PROCESSING_PENDING, self.PROCESSING_RUNNING)
+
+class Tag(models.Model):
+    name = models.CharField(max_length=TAG_NAME_MAX_LENGTH)
+    slug = models.SlugField(max_length=TAG_NAME_MAX_LENGTH, unique=True, allow_unicode=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+class PhotoTag(models.Model):
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='photo_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='photo_tags')
+
+    class Meta:
+        unique_together = ('photo', 'tag')
+        # unique_together covers photo -> tags; this covers tag -> photos.
+        indexes = [models.Index(fields=['tag', 'photo'], name='phototag_tag_photo_idx')]
+
+    def __str__(self):
+        return f'{self.tag} on {self.photo}'
 
 class Album(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     cover_photo = models.ForeignKey(Photo, on_delete=models.SET_NULL, null=True, blank=True, related_name='album_covers')
     photographer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='albums')
-    photos = models.ManyToManyField(Photo, related_name='albums', blank=True)
+    photos = models.ManyToManyField(Photo, through='AlbumPhoto', related_name='albums', blank=True)
+    photo_count = models.PositiveIntegerField(default=0, editable=False)
+    # Pre-rendered collage of the first photos, rebuilt by the album.mosaic task.
+    cover_mosaic = models.ImageField(upload_to='albums/mosaics/', blank=True, editable=False)
+    cover_mosaic_widths = models.JSONField(default=list, blank=True, editable=False)
     is_public = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -59,7 +218,27 @@ class Album(models.Model):
         return self.title
 
     def get_photo_count(self):
-        return self.photos.count()
+        return self.photo_count
+
+    @property
+    def cover_mosaic_renditions(self):
+        return RenditionSet(self.cover_mosaic, self.cover_mosaic_widths)
+
+class AlbumPhoto(models.Model):
+    """A photo's place in an album (see ``albums.py``)"""
+    album = models.ForeignKey(Album, on_delete=models.CASCADE, related_name='memberships')
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='album_memberships')
+    # Rows added through Album.photos.add() are moved to the end by signals.py.
+    position = models.PositiveIntegerField(default=0)
+    added_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('album', 'photo')
+        ordering = ['album', 'position', 'id']
+        indexes = [models.Index(fields=['album', 'position', 'id'], name='albumphoto_position_idx')]
+
+    def __str__(self):
+        return f'{self.photo_id} at {self.position} in {self.album_id}'
 
 class Comment(models.Model):
     photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='comments')
@@ -69,7 +248,10 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
+        # id breaks ties between comments posted in the same instant, so
+        # keyset cursors (see views.photo_comments) never skip or repeat one.
+        ordering = ['-created_at', '-id']
+        indexes = [models.Index(fields=['photo', '-created_at', '-id'], name='comment_photo_created_idx')]
 
     def __str__(self):
         return f'Comment by {self.user.username} on {self.photo.title}'
@@ -85,3 +267,107 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.follower.username} follows {self.following.username}'
+
+class RelatedPhoto(models.Model):
+    """A precomputed "related photos" neighbour of ``photo`` (see ``related.py``)"""
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='recommended_in')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('photo', 'rank')
+        ordering = ['photo', 'rank']
+
+    def __str__(self):
+        return f'{self.related_id} is #{self.rank} related to {self.photo_id}'
+
+class Blob(models.Model):
+    """Reference count of a stored media file (see ``storage.py``)"""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    orphaned_at = models.DateTimeField(null=True, blank=True, help_text="When the last reference went away")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['orphaned_at'], condition=Q(refcount=0), name='blob_orphaned_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount} refs)'
+
+class FeedEntry(models.Model):
+    """
+    A followed photographer's public photo in a user's home feed (see ``feed.py``).
+
+    ``created_at`` copies the photo's, so a feed page is one range scan of
+    ``feed_user_created_idx`` with no join.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='feed_entries')
+    photo = models.ForeignKey(Photo, on_delete=models.CASCADE, related_name='feed_entries')
+    photographer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'photo')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-photo'], name='feed_user_created_idx'),
+        ]
+        verbose_name_plural = 'feed entries'
+
+    def __str__(self):
+        return f'{self.photo_id} in {self.user_id} feed'
+
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+class SiteStats(models.Model):
+    """
+    Single-row snapshot of site-wide counters (see ``stats.py``).
+
+    Creations and deletions adjust the counts as they happen; anything that
+    cannot be tracked incrementally marks the row dirty for a full refresh.
+    """
+    users = models.PositiveIntegerField(default=0)
+    categories = models.PositiveIntegerField(default=0)
+    photos = models.PositiveIntegerField(default=0)
+    public_photos = models.PositiveIntegerField(default=0)
+    albums = models.PositiveIntegerField(default=0)
+    public_albums = models.PositiveIntegerField(default=0)
+    photographers = models.PositiveIntegerField(default=0, help_text="Users with at least one public photo")
+    dirty = models.BooleanField(default=False)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'site stats'
+
+    def __str__(self):
+        return f'Site stats as of {self.refreshed_at:%Y-%m-%d %H:%M}'
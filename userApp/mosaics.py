@@ -0,0 +1,130 @@
+"""
+Album previews and cover mosaics.
+
+Album cards show the first ``PREVIEW_SIZE`` public photos of each album.
+``preview_prefetch()`` loads them for a whole page of albums in one query
+(Django limits each album's share with a ``ROW_NUMBER()`` window), and
+``generate_album_mosaic()`` composes them into a single stored image, so a
+card normally renders one ``<img>`` with a ``srcset``.
+
+The mosaic is rebuilt by the ``album.mosaic`` task whenever an album's
+membership changes (see ``signals.py``). Like uploads, it is stored
+content-addressed and reference counted (``storage.py``), so albums with
+the same preview photos share one file.
+"""
+from contextlib import ExitStack
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Prefetch
+from PIL import Image, ImageOps
+
+from .models import Album, Photo
+from .renditions import RenditionSet, generate_renditions, mosaic_widths, rendition_name, rendition_quality
+from .storage import acquire_blob, discard_renditions, release_blob
+
+PREVIEW_SIZE = 4
+# Pixels between tiles, filled with the background colour.
+GAP = 4
+BACKGROUND = (255, 255, 255)
+
+
+def mosaic_size():
+    return tuple(getattr(settings, 'ALBUM_MOSAIC_SIZE', (1200, 800)))
+
+
+def preview_prefetch():
+    """``Prefetch`` setting ``album.preview_photos`` to the album's first ``PREVIEW_SIZE`` public photos"""
+    # Ordering through the membership reuses the join the prefetch filters on.
+    photos = Photo.objects.filter(is_public=True).order_by('album_memberships__position', 'album_memberships__id')
+    return Prefetch('photos', queryset=photos[:PREVIEW_SIZE], to_attr='preview_photos')
+
+
+def tile_boxes(count, width, height):
+    """``(left, top, right, bottom)`` of each tile for a mosaic of ``count`` photos"""
+    half_width, half_height = (width - GAP) // 2, (height - GAP) // 2
+    right, bottom = half_width + GAP, half_height + GAP
+    if count == 1:
+        return [(0, 0, width, height)]
+    if count == 2:
+        return [(0, 0, half_width, height), (right, 0, width, height)]
+    if count == 3:
+        # One tall tile on the left, two stacked on the right.
+        return [(0, 0, half_width, height), (right, 0, width, half_height), (right, bottom, width, height)]
+    return [
+        (0, 0, half_width, half_height), (right, 0, width, half_height),
+        (0, bottom, half_width, height), (right, bottom, width, height),
+    ]
+
+
+def _source_name(photo, width):
+    """The smallest stored JPEG of ``photo`` at least ``width`` wide, else the original"""
+    renditions = RenditionSet(photo.image, photo.image_widths)
+    best = renditions.best_width(width)
+    if best is None:
+        return photo.image.name
+    return rendition_name(photo.image.name, best, 'jpeg')
+
+
+def render_mosaic(photos):
+    """JPEG bytes of the mosaic of ``photos``, or None if none of their files can be read"""
+    width, height = mosaic_size()
+    with ExitStack() as stack:
+        images = []
+        for photo in photos:
+            # Tiles are at most half the mosaic wide once there are several photos.
+            name = _source_name(photo, width if len(photos) == 1 else width // 2)
+            try:
+                fh = stack.enter_context(photo.image.storage.open(name, 'rb'))
+                images.append(stack.enter_context(Image.open(fh)))
+            except (OSError, ValueError, SyntaxError):
+                continue
+        if not images:
+            return None
+
+        mosaic = Image.new('RGB', (width, height), BACKGROUND)
+        for image, box in zip(images, tile_boxes(len(images), width, height)):
+            size = (box[2] - box[0], box[3] - box[1])
+            # JPEGs decode straight at a reduced scale.
+            image.draft('RGB', size)
+            tile = ImageOps.exif_transpose(image).convert('RGB')
+            mosaic.paste(ImageOps.fit(tile, size, Image.LANCZOS), box[:2])
+
+    buffer = BytesIO()
+    mosaic.save(buffer, 'JPEG', quality=rendition_quality(), optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_album_mosaic(album):
+    """(Re)build ``Album.cover_mosaic`` and its renditions from the album's first public photos"""
+    row = Album.objects.filter(pk=album.pk).values_list('cover_mosaic', 'cover_mosaic_widths').first()
+    if row is None:
+        return
+    previous, previous_widths = row
+    photos = list(Photo.objects.filter(is_public=True).in_album(album)[:PREVIEW_SIZE])
+    data = render_mosaic(photos) if photos else None
+
+    name, widths = '', []
+    if data is not None:
+        album.cover_mosaic.save('mosaic.jpg', ContentFile(data), save=False)
+        name = album.cover_mosaic.name
+        widths = generate_renditions(album.cover_mosaic, mosaic_widths())
+    if name == previous:
+        Album.objects.filter(pk=album.pk).update(cover_mosaic_widths=widths)
+        return
+
+    acquire_blob(name)
+    # Conditional on the mosaic we started from, so concurrent rebuilds
+    # release each blob exactly once.
+    swapped = Album.objects.filter(pk=album.pk, cover_mosaic=previous).update(
+        cover_mosaic=name, cover_mosaic_widths=widths,
+    )
+    storage = album.cover_mosaic.storage
+    if swapped:
+        release_blob(previous)
+        discard_renditions(storage, previous, previous_widths)
+        album.cover_mosaic.name, album.cover_mosaic_widths = name, widths
+    else:
+        release_blob(name)
+        discard_renditions(storage, name, widths)
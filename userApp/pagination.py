@@ -0,0 +1,137 @@
+"""
+Keyset (cursor) pagination for photo listings.
+
+Numbered pages need a COUNT(*) plus an OFFSET scan that grows with the page
+number. Keyset pages instead continue from the sort key of the last row seen
+(``WHERE (created_at, id) < (?, ?)``), which stays an index range scan at any
+depth. Cursors are signed, opaque tokens carried in ``?cursor=``.
+
+``paginate()`` picks the mode: small result sets keep numbered pages, larger
+ones (or any request that already carries a cursor) use keyset pages.
+"""
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+CURSOR_SALT = 'userApp.pagination.cursor'
+
+
+def _parse_ordering(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _encode(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class KeysetPage(Sequence):
+    """One page of a keyset listing; quacks enough like ``Page`` for the templates"""
+
+    is_keyset = True
+    # Numbered navigation never applies to keyset pages.
+    has_other_pages = staticmethod(lambda: False)
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.keys = _parse_ordering(self.ordering)
+        self.fields = [self._field(name) for name, _ in self.keys]
+
+    def _field(self, name):
+        """Model field or annotation output field behind an ordering key"""
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.queryset.query.annotations[name].output_field
+
+    def encode_cursor(self, obj, direction):
+        values = [_encode(getattr(obj, name)) for name, _ in self.keys]
+        return signing.dumps({'k': values, 'd': direction}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        """Return ``(values, direction)`` or ``None`` for a missing/invalid cursor"""
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            values = [field.to_python(value) for field, value in zip(self.fields, data['k'], strict=True)]
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return None
+        direction = 'prev' if data.get('d') == 'prev' else 'next'
+        return values, direction
+
+    def _after(self, values, forward):
+        """Rows strictly after ``values`` in sort order (or before when not ``forward``)"""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1], 'next') if has_more else None
+            return KeysetPage(rows, next_cursor, None)
+
+        values, direction = decoded
+        if direction == 'next':
+            rows = list(self.queryset.filter(self._after(values, True)).order_by(*self.ordering)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1], 'next') if has_more else None
+            previous_cursor = self.encode_cursor(rows[0], 'prev') if rows else None
+            return KeysetPage(rows, next_cursor, previous_cursor)
+
+        reversed_ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        rows = list(self.queryset.filter(self._after(values, False)).order_by(*reversed_ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows else None
+        previous_cursor = self.encode_cursor(rows[0], 'prev') if has_more else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def paginate(request, queryset, ordering, per_page=12):
+    """
+    Paginate ``queryset`` (already ordered by ``ordering``) for ``request``.
+
+    Result sets of up to ``NUMBERED_PAGINATION_MAX_ITEMS`` rows keep numbered
+    ``?page=`` pages; the size check is a COUNT over a LIMITed subquery, so it
+    is bounded however large the table is. Bigger sets, and any request
+    carrying ``?cursor=``, get keyset pages.
+    """
+    cursor = request.GET.get('cursor')
+    limit = getattr(settings, 'NUMBERED_PAGINATION_MAX_ITEMS', 1200)
+    if not cursor and queryset.values('pk')[:limit + 1].count() <= limit:
+        return Paginator(queryset, per_page).get_page(request.GET.get('page'))
+    return KeysetPaginator(queryset, per_page, ordering).get_page(cursor)
@@ -0,0 +1,199 @@
+"""
+Precomputed "related photos".
+
+``compute_related_photos()`` scores pairs of public photos, keeps the top
+``RELATED_PHOTOS_COUNT`` neighbours of each and rewrites the ``RelatedPhoto``
+table, so ``photo_detail`` reads them with one lookup on ``(photo, rank)``.
+Run it periodically with ``manage.py compute_related_photos``.
+
+Scores come from shared features: tags, users who liked both photos,
+public albums containing both and perceptual hashes within a few bits of
+each other (visually similar images, see ``fingerprints.py``). Each shared feature adds its signal weight
+divided by ``log(1 + n)``, where ``n`` is the number of photos carrying it,
+so a niche tag counts for more than "landscape". Features on more than
+``RELATED_MAX_FEATURE_PHOTOS`` photos are skipped: they pair up nearly
+everything and say little. Candidates by the same photographer or in the
+same category get a small bonus on top.
+
+The scoring is vectorized with NumPy and runs over blocks of photos, so
+memory stays bounded by the block rather than by the number of pairs.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .fingerprints import expand_ranges, similar_hashes
+from .models import Album, Photo, PhotoTag, RelatedPhoto
+
+SIGNAL_WEIGHTS = {'tags': 1.0, 'albums': 0.8, 'likes': 0.6, 'similar': 0.5}
+SIMILAR_DISTANCE = 6
+SAME_PHOTOGRAPHER_BONUS = 0.1
+SAME_CATEGORY_BONUS = 0.05
+BLOCK_SIZE = 1000
+WRITE_BATCH = 5000
+
+
+def _rows(queryset, columns):
+    values = np.fromiter(
+        (value for row in queryset.iterator(chunk_size=10000) for value in row), dtype=np.int64,
+    )
+    return values.reshape(-1, columns)
+
+
+def _similar_images():
+    """
+    ``(photo_id, feature)`` rows linking photos with near-identical
+    perceptual hashes: one feature per distinct hash, and one per pair of
+    hashes within ``SIMILAR_DISTANCE`` bits.
+    """
+    photos = _rows(Photo.objects.filter(phash__isnull=False, is_public=True).values_list('pk', 'phash'), 2)
+    values, inverse = np.unique(photos[:, 1], return_inverse=True)
+    near_a, near_b = similar_hashes(values, SIMILAR_DISTANCE)
+
+    order = np.argsort(inverse, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(values)))))
+    sizes = np.diff(starts)
+    pair_ids = np.arange(len(near_a)) + len(values)
+    members = np.concatenate((
+        order[expand_ranges(starts[near_a], sizes[near_a])],
+        order[expand_ranges(starts[near_b], sizes[near_b])],
+    ))
+    features = np.concatenate((np.repeat(pair_ids, sizes[near_a]), np.repeat(pair_ids, sizes[near_b])))
+    return np.concatenate((
+        np.column_stack((photos[:, 0], inverse)),
+        np.column_stack((photos[members, 0], features)),
+    ))
+
+
+def _signals():
+    """``(name, [[photo_id, feature_id], ...])`` for every scoring signal"""
+    yield 'tags', _rows(PhotoTag.objects.values_list('photo_id', 'tag_id'), 2)
+    yield 'albums', _rows(
+        Album.photos.through.objects.filter(album__is_public=True).values_list('photo_id', 'album_id'), 2,
+    )
+    yield 'likes', _rows(Photo.likes.through.objects.values_list('photo_id', 'customuser_id'), 2)
+    yield 'similar', _similar_images()
+
+
+def _features(ids):
+    """
+    Photo positions, feature numbers and per-feature weights for all signals.
+
+    Features that cannot pair photos, or are too common to be useful, are
+    dropped here.
+    """
+    max_photos = getattr(settings, 'RELATED_MAX_FEATURE_PHOTOS', 500)
+    positions, features, weights = [], [], []
+    offset = 0
+    for name, rows in _signals():
+        found = np.searchsorted(ids, rows[:, 0])
+        public = found < len(ids)
+        public[public] = ids[found[public]] == rows[public, 0]
+        _, feature = np.unique(rows[public, 1], return_inverse=True)
+        counts = np.bincount(feature)
+        useful = (counts >= 2) & (counts <= max_photos)
+        weight = np.where(useful, SIGNAL_WEIGHTS[name] / np.log1p(np.maximum(counts, 1)), 0.0)
+        keep = useful[feature]
+        positions.append(found[public][keep])
+        features.append(feature[keep] + offset)
+        weights.append(weight)
+        offset += len(counts)
+    return np.concatenate(positions), np.concatenate(features), np.concatenate(weights)
+
+
+def _offsets(keys, size):
+    """Start offsets of each key in ``keys`` once sorted (CSR-style)"""
+    return np.concatenate(([0], np.cumsum(np.bincount(keys, minlength=size))))
+
+
+def score_related(ids, photographers, categories, count):
+    """
+    Yield ``(photo position, related position, rank, score)`` arrays per block.
+
+    ``ids`` is the sorted array of public photo ids; ``photographers`` and
+    ``categories`` are aligned with it (-1 for no category).
+    """
+    n = len(ids)
+    positions, features, weights = _features(ids)
+    if not len(positions):
+        return
+
+    by_feature = np.argsort(features, kind='stable')
+    members = positions[by_feature]
+    feature_starts = _offsets(features, len(weights))
+    feature_sizes = np.diff(feature_starts)
+
+    by_photo = np.argsort(positions, kind='stable')
+    photo_features = features[by_photo]
+    photo_starts = _offsets(positions, n)
+
+    for block in range(0, n, BLOCK_SIZE):
+        end = min(block + BLOCK_SIZE, n)
+        lo, hi = photo_starts[block], photo_starts[end]
+        if lo == hi:
+            continue
+        own = photo_features[lo:hi]
+        left = np.repeat(np.arange(block, end), np.diff(photo_starts[block:end + 1]))
+
+        # Every photo sharing each of the block's features.
+        sizes = feature_sizes[own]
+        right = members[expand_ranges(feature_starts[own], sizes)]
+        left = np.repeat(left, sizes)
+        shared = np.repeat(weights[own], sizes)
+        other = right != left
+
+        pairs, inverse = np.unique((left[other] - block) * n + right[other], return_inverse=True)
+        scores = np.bincount(inverse, weights=shared[other])
+        left, right = pairs // n + block, pairs % n
+        scores += SAME_PHOTOGRAPHER_BONUS * (photographers[left] == photographers[right])
+        scores += SAME_CATEGORY_BONUS * ((categories[left] == categories[right]) & (categories[left] >= 0))
+
+        # Best first within each photo; newer photos win ties.
+        order = np.lexsort((-right, -scores, left))
+        left, right, scores = left[order], right[order], scores[order]
+        first = np.concatenate(([True], left[1:] != left[:-1]))
+        group_start = np.maximum.accumulate(np.where(first, np.arange(len(left)), 0))
+        rank = np.arange(len(left)) - group_start
+        top = rank < count
+        yield left[top], right[top], rank[top], scores[top]
+
+
+def compute_related_photos(count=None):
+    """Recompute every public photo's related photos; returns the rows written"""
+    count = count or getattr(settings, 'RELATED_PHOTOS_COUNT', 12)
+    rows = Photo.objects.filter(is_public=True).order_by('pk').values_list('pk', 'photographer_id', 'category_id')
+    photos = np.array(
+        [(pk, user_id, category_id or -1) for pk, user_id, category_id in rows.iterator(chunk_size=10000)],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    ids, photographers, categories = photos[:, 0], photos[:, 1], photos[:, 2]
+
+    written = 0
+    with transaction.atomic():
+        RelatedPhoto.objects.all().delete()
+        batch = []
+        for left, right, rank, scores in score_related(ids, photographers, categories, count):
+            for photo_id, related_id, position, score in zip(
+                ids[left].tolist(), ids[right].tolist(), rank.tolist(), scores.tolist(),
+            ):
+                batch.append(RelatedPhoto(photo_id=photo_id, related_id=related_id, rank=position, score=score))
+                if len(batch) >= WRITE_BATCH:
+                    written += len(RelatedPhoto.objects.bulk_create(batch))
+                    batch = []
+        if batch:
+            written += len(RelatedPhoto.objects.bulk_create(batch))
+    return written
+
+
+def related_photos(photo, limit=6):
+    """``photo``'s precomputed related photos, or the photographer's latest until they are computed"""
+    related = list(
+        Photo.objects.filter(recommended_in__photo=photo, is_public=True)
+        .select_related('photographer').order_by('recommended_in__rank')[:limit]
+    )
+    if related:
+        return related
+    return list(
+        Photo.objects.filter(photographer_id=photo.photographer_id, is_public=True)
+        .exclude(pk=photo.pk).select_related('photographer').order_by('-created_at')[:limit]
+    )
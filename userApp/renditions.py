@@ -0,0 +1,163 @@
+"""
+Fixed-size renditions (thumbnails) for uploaded images.
+
+Every rendition is written next to the original under a ``renditions/``
+folder, e.g. ``photos/sunset.jpg`` -> ``photos/renditions/sunset-640w.webp``,
+so URLs can be derived from the original name plus the list of widths that
+were actually generated (stored on the model).
+"""
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Output formats, in <source> preference order. JPEG is the <img> fallback.
+FORMATS = {
+    'webp': {'ext': 'webp', 'mime': 'image/webp', 'pil': 'WEBP'},
+    'jpeg': {'ext': 'jpg', 'mime': 'image/jpeg', 'pil': 'JPEG'},
+}
+
+DEFAULT_PHOTO_WIDTHS = (320, 640, 1280)
+DEFAULT_PROFILE_WIDTHS = (64, 160, 320)
+DEFAULT_MOSAIC_WIDTHS = (400, 800)
+
+
+def photo_widths():
+    return tuple(getattr(settings, 'PHOTO_RENDITION_WIDTHS', DEFAULT_PHOTO_WIDTHS))
+
+
+def profile_widths():
+    return tuple(getattr(settings, 'PROFILE_RENDITION_WIDTHS', DEFAULT_PROFILE_WIDTHS))
+
+
+def mosaic_widths():
+    return tuple(getattr(settings, 'ALBUM_MOSAIC_WIDTHS', DEFAULT_MOSAIC_WIDTHS))
+
+
+def rendition_quality():
+    return getattr(settings, 'RENDITION_QUALITY', 82)
+
+
+def rendition_name(name, width, fmt):
+    """Storage name of the ``width``/``fmt`` rendition of original ``name``"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'renditions', f'{stem}-{width}w.{FORMATS[fmt]["ext"]}')
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    options = {'quality': rendition_quality()}
+    if fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    image.save(buffer, FORMATS[fmt]['pil'], **options)
+    return buffer.getvalue()
+
+
+def generate_renditions(fieldfile, widths):
+    """
+    Write every width/format rendition for ``fieldfile`` and return the sorted
+    list of widths that were generated.
+
+    Widths larger than the original are skipped so nothing is upscaled; the
+    smallest requested width is always produced (capped at the original size)
+    so even tiny uploads get a rendition.
+    """
+    if not fieldfile:
+        return []
+
+    storage = fieldfile.storage
+    with storage.open(fieldfile.name, 'rb') as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'L'):
+            original = original.convert('RGBA')
+            background = Image.new('RGB', original.size, (255, 255, 255))
+            background.paste(original, mask=original.split()[-1])
+            original = background
+        elif original.mode == 'L':
+            original = original.convert('RGB')
+        original.load()
+
+    requested = sorted(set(widths))
+    targets = [width for width in requested if width <= original.width] or requested[:1]
+
+    generated = []
+    for width in targets:
+        image = original.copy()
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+        for fmt in FORMATS:
+            name = rendition_name(fieldfile.name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(_encode(image, fmt)))
+        generated.append(width)
+    return generated
+
+
+def delete_renditions(storage, name, widths):
+    """Remove previously generated renditions of the stored file ``name``"""
+    if not name:
+        return
+    for width in widths:
+        for fmt in FORMATS:
+            storage.delete(rendition_name(name, width, fmt))
+
+
+class RenditionSet:
+    """
+    Template-facing view over the renditions of one image field.
+
+    Falls back to the original URL when no renditions exist yet (legacy
+    uploads that predate the pipeline or haven't been backfilled).
+    """
+
+    def __init__(self, fieldfile, widths):
+        self.fieldfile = fieldfile
+        self.widths = sorted(widths or [])
+
+    def __bool__(self):
+        return bool(self.fieldfile)
+
+    def url(self, width, fmt='jpeg'):
+        return self.fieldfile.storage.url(rendition_name(self.fieldfile.name, width, fmt))
+
+    def srcset(self, fmt='jpeg'):
+        return ', '.join(f'{self.url(width, fmt)} {width}w' for width in self.widths)
+
+    def best_width(self, target):
+        """Smallest generated width that is at least ``target`` (or the largest)"""
+        for width in self.widths:
+            if width >= target:
+                return width
+        return self.widths[-1] if self.widths else None
+
+    def fallback_url(self, target=640):
+        width = self.best_width(target)
+        if width is None:
+            return self.fieldfile.url
+        return self.url(width, 'jpeg')
+
+    @property
+    def small_url(self):
+        return self.fallback_url(self.widths[0] if self.widths else 0)
+
+
+def generate_photo_renditions(photo):
+    """(Re)build renditions for ``Photo.image`` and record the widths"""
+    photo.image_widths = generate_renditions(photo.image, photo_widths())
+    type(photo).objects.filter(pk=photo.pk).update(image_widths=photo.image_widths)
+    return photo.image_widths
+
+
+def generate_profile_renditions(user):
+    """(Re)build renditions for ``CustomUser.profile_image`` and record the widths"""
+    user.profile_image_widths = generate_renditions(user.profile_image, profile_widths())
+    type(user).objects.filter(pk=user.pk).update(profile_image_widths=user.profile_image_widths)
+    return user.profile_image_widths
@@ -0,0 +1,118 @@
+"""
+Read replica routing.
+
+When ``READ_REPLICA_ALIAS`` names a database (see ``DATABASES`` in
+settings), views decorated with ``@read_from_replica`` run their queries
+against it; everything else, and every write, uses the primary. Only
+read-only listing pages are decorated, as they tolerate a few seconds of
+replication lag. An anonymous page rendered from a lagging replica can stay
+in the page cache until the next change or ``PAGE_CACHE_TIMEOUT``.
+
+A client that has just written something is pinned to the primary for
+``REPLICA_PIN_SECONDS`` by ``ReplicaPinMiddleware``, so it sees its own
+upload, like or comment on the next page instead of the replica's older
+copy.
+
+Without a database server, a second SQLite file can play the replica:
+``sync_sqlite_replica()`` (``manage.py sync_replica``) copies the primary
+into it, and the copy lags until the next sync, much like a real replica.
+"""
+import sqlite3
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def replica_alias():
+    return getattr(settings, 'READ_REPLICA_ALIAS', None)
+
+
+def _separate_replica():
+    """The replica alias, unless it is just a mirror of the primary (as under the test runner)"""
+    alias = replica_alias()
+    if not alias or alias not in connections.settings:
+        return alias
+    if connections[alias].settings_dict['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        return None
+    return alias
+
+
+@contextmanager
+def reading_from_replica():
+    """Send the reads of the block to the replica, if one is configured"""
+    token = _reading_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_from_replica.reset(token)
+
+
+def read_from_replica(view):
+    """Run ``view`` against the replica unless the client is pinned to the primary"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or PIN_COOKIE in request.COOKIES:
+            return view(request, *args, **kwargs)
+        with reading_from_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads inside ``reading_from_replica()`` go to the replica; all writes and migrations to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if _reading_from_replica.get():
+            return _separate_replica() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Also for objects loaded from the replica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema by replication.
+        return db != replica_alias()
+
+
+class ReplicaPinMiddleware:
+    """Pin clients to the primary for ``REPLICA_PIN_SECONDS`` after each request that may write"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if replica_alias() and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10), httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def sync_sqlite_replica():
+    """Copy the SQLite primary into the SQLite replica file; returns the replica's path"""
+    alias = replica_alias()
+    if not alias:
+        raise ImproperlyConfigured('No read replica is configured (set DATABASE_REPLICA_URL)')
+    primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+    if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+        raise ImproperlyConfigured('sync_replica only copies between SQLite databases')
+    # The backup API copies a consistent snapshot, even while the primary is written to.
+    replica.close()
+    primary.ensure_connection()
+    with closing(sqlite3.connect(replica.settings_dict['NAME'])) as target:
+        primary.connection.backup(target)
+    return replica.settings_dict['NAME']
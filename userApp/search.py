@@ -0,0 +1,282 @@
+"""
+Full-text photo search.
+
+Photos are indexed over title, description, tags, location and the
+photographer's username. The index lives beside the photo table and is kept
+in sync by the receivers in ``signals.py``; ``manage.py rebuild_search_index``
+rebuilds it from scratch.
+
+The backend follows the database: SQLite uses an FTS5 virtual table ranked
+with ``bm25()``, PostgreSQL a ``tsvector`` table with a GIN index ranked with
+``ts_rank()``. Other databases fall back to ``icontains`` filtering.
+
+``search_photos()`` filters a photo queryset. With ``ranked=True`` it also
+annotates ``search_rank`` (higher is better), so results can be ordered by
+relevance and paginated with the usual keyset paginator. The ranks come
+from a derived table of ``(photo_id, rank)`` rows joined to the photos, so
+the full-text query runs once per SQL query rather than once per photo.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import Expression, RawSQL
+from django.db.models.sql.constants import INNER
+from django.db.models.sql.datastructures import Join
+
+RELEVANCE_ORDERING = ('-search_rank', '-id')
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(query):
+    """Words of a user query, lowercased, punctuation and operators dropped"""
+    return [term.lower() for term in _TERM_RE.findall(query or '')][:16]
+
+
+def _tables():
+    from .models import CustomUser, Photo
+
+    return Photo._meta.db_table, CustomUser._meta.db_table
+
+
+class _MatchJoin(Join):
+    """``INNER JOIN (<sql>) ON photo_id = id``: a derived table of matches joined to the photo table"""
+
+    def __init__(self, sql, params, parent_alias, table_alias=None, join_type=INNER):
+        self.sql, self.params = sql, tuple(params)
+        self.table_name = 'search_matches'
+        self.parent_alias = parent_alias
+        self.table_alias = table_alias
+        self.join_type = join_type
+        self.join_field = None
+        self.nullable = False
+        self.filtered_relation = None
+
+    def as_sql(self, compiler, connection):
+        qn, qn2 = compiler.quote_name_unless_alias, connection.ops.quote_name
+        on = f'{qn(self.table_alias)}.{qn2("photo_id")} = {qn(self.parent_alias)}.{qn2("id")}'
+        return f'{self.join_type} ({self.sql}) {qn(self.table_alias)} ON ({on})', list(self.params)
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(
+            self.sql, self.params, change_map.get(self.parent_alias, self.parent_alias),
+            change_map.get(self.table_alias, self.table_alias), self.join_type,
+        )
+
+    @property
+    def identity(self):
+        return self.__class__, self.sql, self.params, self.parent_alias
+
+
+class _MatchRank(Expression):
+    """The ``rank`` column of a ``_MatchJoin``"""
+
+    def __init__(self, alias):
+        super().__init__(output_field=FloatField())
+        self.alias = alias
+
+    def as_sql(self, compiler, connection):
+        return f'{compiler.quote_name_unless_alias(self.alias)}.{connection.ops.quote_name("rank")}', []
+
+    def relabeled_clone(self, change_map):
+        return self.__class__(change_map.get(self.alias, self.alias))
+
+    def get_group_by_cols(self):
+        return [self]
+
+
+def _with_ranks(queryset, sql, params):
+    """Join ``queryset`` to the ``(photo_id, rank)`` rows of ``sql``, annotated as ``search_rank``"""
+    queryset = queryset.all()
+    query = queryset.query
+    alias = query.join(_MatchJoin(sql, params, query.get_initial_alias()))
+    return queryset.annotate(search_rank=_MatchRank(alias))
+
+
+class SQLiteBackend:
+    table = 'userApp_photo_fts'
+
+    def create(self, cursor):
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{self.table}" USING fts5('
+            'title, description, tags, location, photographer, '
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS "{self.table}"')
+
+    def remove(self, cursor, photo_ids):
+        placeholders = ', '.join(['%s'] * len(photo_ids))
+        cursor.execute(f'DELETE FROM "{self.table}" WHERE rowid IN ({placeholders})', list(photo_ids))
+
+    def index(self, cursor, photo_ids=None):
+        photo_table, user_table = _tables()
+        sql = (
+            f'INSERT INTO "{self.table}" (rowid, title, description, tags, location, photographer) '
+            f'SELECT p.id, p.title, p.description, p.tags, p.location, u.username '
+            f'FROM "{photo_table}" p JOIN "{user_table}" u ON u.id = p.photographer_id'
+        )
+        params = []
+        if photo_ids is not None:
+            self.remove(cursor, photo_ids)
+            sql += f' WHERE p.id IN ({", ".join(["%s"] * len(photo_ids))})'
+            params = list(photo_ids)
+        else:
+            cursor.execute(f'DELETE FROM "{self.table}"')
+        cursor.execute(sql, params)
+
+    def match_expression(self, terms):
+        # Every term must match; the last one as a prefix so results appear while typing.
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def filter(self, queryset, terms, ranked=False):
+        match = self.match_expression(terms)
+        if ranked:
+            # bm25() is lower-is-better; weights favour title and tags over description.
+            return _with_ranks(queryset, (
+                f'SELECT rowid AS photo_id, -bm25("{self.table}", 10.0, 2.0, 5.0, 3.0, 4.0) AS rank '
+                f'FROM "{self.table}" WHERE "{self.table}" MATCH %s'
+            ), [match])
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM "{self.table}" WHERE "{self.table}" MATCH %s', [match])
+        )
+
+
+class PostgreSQLBackend:
+    table = 'userApp_photo_search'
+
+    @property
+    def config(self):
+        return getattr(settings, 'SEARCH_CONFIG', 'english')
+
+    def create(self, cursor):
+        photo_table, _ = _tables()
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{self.table}" ('
+            f'photo_id integer PRIMARY KEY REFERENCES "{photo_table}" (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS "{self.table}_document_idx" ON "{self.table}" USING gin (document)')
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS "{self.table}"')
+
+    def remove(self, cursor, photo_ids):
+        cursor.execute(f'DELETE FROM "{self.table}" WHERE photo_id = ANY(%s)', [list(photo_ids)])
+
+    def index(self, cursor, photo_ids=None):
+        photo_table, user_table = _tables()
+        document = ' || '.join(
+            f"setweight(to_tsvector(%s::regconfig, coalesce({column}, '')), '{weight}')"
+            for column, weight in (
+                ('p.title', 'A'), ('p.tags', 'A'), ('u.username', 'B'), ('p.location', 'B'), ('p.description', 'C'),
+            )
+        )
+        params = [self.config] * 5
+        sql = (
+            f'INSERT INTO "{self.table}" (photo_id, document) '
+            f'SELECT p.id, {document} '
+            f'FROM "{photo_table}" p JOIN "{user_table}" u ON u.id = p.photographer_id'
+        )
+        if photo_ids is not None:
+            sql += ' WHERE p.id = ANY(%s)'
+            params.append(list(photo_ids))
+        else:
+            cursor.execute(f'TRUNCATE "{self.table}"')
+        sql += ' ON CONFLICT (photo_id) DO UPDATE SET document = EXCLUDED.document'
+        cursor.execute(sql, params)
+
+    def match_expression(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def filter(self, queryset, terms, ranked=False):
+        tsquery = 'to_tsquery(%s::regconfig, %s)'
+        params = [self.config, self.match_expression(terms)]
+        if ranked:
+            return _with_ranks(queryset, (
+                f'SELECT photo_id, ts_rank(document, q) AS rank '
+                f'FROM "{self.table}", {tsquery} q WHERE document @@ q'
+            ), params)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT photo_id FROM "{self.table}" WHERE document @@ {tsquery}', params)
+        )
+
+
+class FallbackBackend:
+    """Unindexed ``icontains`` search for databases without a full-text backend"""
+
+    def create(self, cursor):
+        pass
+
+    def drop(self, cursor):
+        pass
+
+    def remove(self, cursor, photo_ids):
+        pass
+
+    def index(self, cursor, photo_ids=None):
+        pass
+
+    def filter(self, queryset, terms, ranked=False):
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(title__icontains=term) |
+                Q(description__icontains=term) |
+                Q(tags__icontains=term) |
+                Q(location__icontains=term) |
+                Q(photographer__username__icontains=term)
+            )
+        queryset = queryset.filter(condition)
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())) if ranked else queryset
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgreSQLBackend,
+}
+
+
+def get_backend(conn=None):
+    return BACKENDS.get((conn or connection).vendor, FallbackBackend)()
+
+
+def search_photos(queryset, query, ranked=False):
+    """Filter ``queryset`` to photos matching ``query``; ``ranked`` annotates ``search_rank`` for relevance order"""
+    terms = search_terms(query)
+    if not terms:
+        queryset = queryset.none()
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())) if ranked else queryset
+    return get_backend().filter(queryset, terms, ranked)
+
+
+def index_photos(photo_ids):
+    """(Re)index the given photos"""
+    photo_ids = list(photo_ids)
+    if photo_ids:
+        with connection.cursor() as cursor:
+            get_backend().index(cursor, photo_ids)
+
+
+def remove_photos(photo_ids):
+    photo_ids = list(photo_ids)
+    if photo_ids:
+        with connection.cursor() as cursor:
+            get_backend().remove(cursor, photo_ids)
+
+
+def rebuild_index(conn=None):
+    """Recreate the search index from the photo table; returns the number of photos indexed"""
+    from .models import Photo
+
+    conn = conn or connection
+    backend = get_backend(conn)
+    with conn.cursor() as cursor:
+        backend.create(cursor)
+        backend.index(cursor)
+    return Photo.objects.using(conn.alias).count()
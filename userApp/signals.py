@@ -0,0 +1,312 @@
+"""
+Signal receivers that keep the denormalized counters in sync.
+
+Comment and follow counters are adjusted with ``F()`` expressions. Likes and
+album membership are recounted for the affected rows, because M2M
+``post_remove`` reports the requested ids rather than the rows actually
+removed. M2M rows deleted by a cascade send no m2m_changed signal, so photo
+and user deletions recount what they touched.
+
+Photo and username changes are also mirrored into the full-text search index
+(``search.py``), and photo tag strings into ``Tag`` rows (``tagging.py``).
+
+Content changes also bump the cache versions that anonymous pages and card
+fragments are keyed on (``caching.py``), and adjust the site-wide counters
+in the ``SiteStats`` snapshot (``stats.py``).
+
+Stored media files are reference counted across ``Photo.image``,
+``CustomUser.profile_image`` and ``Album.cover_mosaic`` (``storage.py``), and
+the renditions of a file are deleted once nothing references it. Album
+cover mosaics are rebuilt by an ``album.mosaic`` task when the album's
+photos change (``mosaics.py``). Photos added to an album go to its end
+(``albums.py``).
+
+Public photos are fanned out to their photographer's followers' home feeds
+by a ``feed.fan_out`` task, and follows add or remove feed rows (``feed.py``).
+"""
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .albums import append_positions, rebuild_album_mosaics
+from .caching import bump
+from .counters import recount_album_photos, recount_photo_likes
+from .feed import backfill_feed, is_fanned_out, remove_photo, unfollow_feed
+from .models import Album, Category, Comment, CustomUser, FeedEntry, Follow, Photo
+from .search import index_photos, remove_photos
+from .stats import adjust_site_stats
+from .storage import acquire_blob, discard_renditions, release_blob
+from .tagging import invalidate_popular_tags, sync_photo_tags
+from .tasks import enqueue
+
+
+def _m2m_targets(instance, action, reverse, pk_set, reverse_accessor):
+    """Primary keys on the counted side touched by an m2m_changed event"""
+    if action == 'pre_clear':
+        if reverse:
+            instance._cleared_m2m_pks = list(getattr(instance, reverse_accessor).values_list('pk', flat=True))
+        return None
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return None
+    if not reverse:
+        if action != 'post_clear' and not pk_set:
+            return None
+        return [instance.pk]
+    if action == 'post_clear':
+        return instance.__dict__.pop('_cleared_m2m_pks', None)
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Photo.likes.through)
+def photo_likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    photo_ids = _m2m_targets(instance, action, reverse, pk_set, 'liked_photos')
+    if photo_ids:
+        recount_photo_likes(photo_ids)
+
+
+@receiver(m2m_changed, sender=Album.photos.through)
+def album_photos_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add' and pk_set:
+        # New rows have the default position; put them at the end.
+        if reverse:
+            for album_id in pk_set:
+                append_positions(album_id, [instance.pk])
+        else:
+            append_positions(instance.pk, pk_set)
+    album_ids = _m2m_targets(instance, action, reverse, pk_set, 'albums')
+    if album_ids:
+        recount_album_photos(album_ids)
+        rebuild_album_mosaics(album_ids)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        Photo.objects.filter(pk=instance.photo_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Photo.objects.filter(pk=instance.photo_id, comment_count__gt=0).update(comment_count=F('comment_count') - 1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        CustomUser.objects.filter(pk=instance.following_id).update(follower_count=F('follower_count') + 1)
+        CustomUser.objects.filter(pk=instance.follower_id).update(following_count=F('following_count') + 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    CustomUser.objects.filter(pk=instance.following_id, follower_count__gt=0).update(
+        follower_count=F('follower_count') - 1
+    )
+    CustomUser.objects.filter(pk=instance.follower_id, following_count__gt=0).update(
+        following_count=F('following_count') - 1
+    )
+
+
+@receiver(pre_save, sender=Photo)
+def photo_saving(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or (update_fields is not None and not {'image', 'is_public'} & set(update_fields)):
+        return
+    instance._previous_mosaic_state = Photo.objects.filter(pk=instance.pk).values_list('image', 'is_public').first()
+
+
+@receiver(post_save, sender=Photo)
+def photo_saved(sender, instance, created, update_fields=None, **kwargs):
+    fields = None if update_fields is None else set(update_fields)
+    if fields is None or 'tags' in fields:
+        sync_photo_tags(instance)
+    if fields is None or {'tags', 'is_public'} & fields:
+        invalidate_popular_tags()
+    if fields is None or {'title', 'description', 'tags', 'location'} & fields:
+        index_photos([instance.pk])
+    previous = instance.__dict__.pop('_previous_mosaic_state', None)
+    if previous is not None and previous != ((instance.image.name or ''), instance.is_public):
+        # The photo may appear in, join or leave album mosaics.
+        rebuild_album_mosaics(instance.albums.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Photo)
+def photo_deleting(sender, instance, **kwargs):
+    instance._album_ids = list(instance.albums.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Photo)
+def photo_deleted(sender, instance, **kwargs):
+    remove_photos([instance.pk])
+    invalidate_popular_tags()
+    album_ids = instance.__dict__.pop('_album_ids', None)
+    if album_ids:
+        recount_album_photos(album_ids)
+        rebuild_album_mosaics(album_ids)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # The username is indexed with each photo; logins only touch last_login.
+    if not created and (update_fields is None or 'username' in update_fields):
+        index_photos(instance.photos.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=CustomUser)
+def user_deleting(sender, instance, **kwargs):
+    instance._liked_photo_ids = list(instance.liked_photos.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    photo_ids = instance.__dict__.pop('_liked_photo_ids', None)
+    if photo_ids:
+        recount_photo_likes(photo_ids)
+
+
+@receiver([post_save, post_delete], sender=Photo)
+@receiver([post_save, post_delete], sender=Comment)
+@receiver(m2m_changed, sender=Photo.likes.through)
+def photos_changed(sender, **kwargs):
+    bump('photos')
+
+
+@receiver([post_save, post_delete], sender=Album)
+@receiver(m2m_changed, sender=Album.photos.through)
+def albums_changed(sender, **kwargs):
+    bump('albums')
+
+
+@receiver([post_save, post_delete], sender=Follow)
+@receiver(post_delete, sender=CustomUser)
+def users_changed(sender, **kwargs):
+    bump('users')
+
+
+@receiver(post_save, sender=CustomUser)
+def user_profile_changed(sender, update_fields=None, **kwargs):
+    # Logins save last_login only, which no cached page shows.
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        bump('users')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def categories_changed(sender, **kwargs):
+    bump('categories')
+
+
+@receiver(post_save, sender=Photo)
+def photo_stats_saved(sender, instance, created, **kwargs):
+    if created:
+        # A public photo may be its photographer's first one.
+        adjust_site_stats(photos=1, public_photos=int(instance.is_public), dirty=instance.is_public)
+    else:
+        adjust_site_stats(dirty=True)
+
+
+@receiver(post_delete, sender=Photo)
+def photo_stats_deleted(sender, instance, **kwargs):
+    adjust_site_stats(photos=-1, public_photos=-int(instance.is_public), dirty=instance.is_public)
+
+
+@receiver(post_save, sender=Album)
+def album_stats_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_site_stats(albums=1, public_albums=int(instance.is_public))
+    else:
+        adjust_site_stats(dirty=True)
+
+
+@receiver(post_delete, sender=Album)
+def album_stats_deleted(sender, instance, **kwargs):
+    adjust_site_stats(albums=-1, public_albums=-int(instance.is_public))
+
+
+@receiver(post_save, sender=CustomUser)
+def user_stats_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_site_stats(users=1)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_stats_deleted(sender, instance, **kwargs):
+    adjust_site_stats(users=-1)
+
+
+@receiver(post_save, sender=Category)
+def category_stats_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_site_stats(categories=1)
+
+
+@receiver(post_delete, sender=Category)
+def category_stats_deleted(sender, instance, **kwargs):
+    adjust_site_stats(categories=-1)
+
+
+@receiver(post_save, sender=Photo)
+def photo_feed_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'is_public' not in update_fields:
+        return
+    if not instance.is_public:
+        if not created:
+            remove_photo(instance.pk)
+        return
+    # Edits of a photo that is already in feeds need no new fan-out.
+    if created or not FeedEntry.objects.filter(photo_id=instance.pk).exists():
+        follower_count = (
+            CustomUser.objects.filter(pk=instance.photographer_id).values_list('follower_count', flat=True).first()
+        )
+        if follower_count and is_fanned_out(follower_count):
+            enqueue('feed.fan_out', photo_id=instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_feed_created(sender, instance, created, **kwargs):
+    if created:
+        backfill_feed(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_feed_deleted(sender, instance, **kwargs):
+    unfollow_feed(instance.follower_id, instance.following_id)
+
+
+BLOB_FIELDS = {Photo: 'image', CustomUser: 'profile_image', Album: 'cover_mosaic'}
+# The rendition widths stored alongside each blob field.
+WIDTH_FIELDS = {Photo: 'image_widths', CustomUser: 'profile_image_widths', Album: 'cover_mosaic_widths'}
+
+
+@receiver(pre_save, sender=Photo)
+@receiver(pre_save, sender=CustomUser)
+@receiver(pre_save, sender=Album)
+def blob_owner_saving(sender, instance, update_fields=None, **kwargs):
+    field = BLOB_FIELDS[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+    previous = None
+    if instance.pk is not None:
+        previous = sender._default_manager.filter(pk=instance.pk).values_list(field, WIDTH_FIELDS[sender]).first()
+    instance._previous_blob = previous or ('', [])
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Album)
+def blob_owner_saved(sender, instance, **kwargs):
+    if '_previous_blob' not in instance.__dict__:
+        return
+    previous, widths = instance.__dict__.pop('_previous_blob')
+    fieldfile = getattr(instance, BLOB_FIELDS[sender])
+    if (fieldfile.name or '') != previous:
+        acquire_blob(fieldfile.name)
+        release_blob(previous)
+        discard_renditions(fieldfile.storage, previous, widths)
+
+
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Album)
+def blob_owner_deleted(sender, instance, **kwargs):
+    fieldfile = getattr(instance, BLOB_FIELDS[sender])
+    release_blob(fieldfile.name)
+    discard_renditions(fieldfile.storage, fieldfile.name, getattr(instance, WIDTH_FIELDS[sender]))
@@ -0,0 +1,239 @@
+"""
+XML sitemaps, split into a sitemap index and paginated child sitemaps.
+
+Each section (photos, albums, ...) is paged by primary key range: page ``n``
+holds rows with keys ``(n - 1) * size + 1`` to ``n * size``. Pages are
+therefore stable, and one page is an index range scan no matter how large
+the catalogue grows. Pages can be smaller than ``size`` when rows were
+deleted, but never bigger, so they stay under the 50,000 URL limit.
+
+Child sitemaps are streamed from ``.iterator()`` querysets. Every response
+carries an ETag and Last-Modified derived from the rows it covers.
+"""
+import hashlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Q
+from django.urls import reverse
+
+from .caching import get_versions
+from .models import Album, Category, CustomUser, Photo, PhotoTag, Tag
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+MAX_URLS_PER_SITEMAP = 50000
+WRITE_BATCH = 500
+
+
+def page_size():
+    return max(1, min(getattr(settings, 'SITEMAP_PAGE_SIZE', 10000), MAX_URLS_PER_SITEMAP))
+
+
+def w3c_datetime(value):
+    return value.isoformat(timespec='seconds') if value else ''
+
+
+class Section:
+    """A sitemap section; subclasses describe their rows and URLs"""
+
+    name = None
+    changefreq = 'weekly'
+    priority = '0.5'
+
+    def source(self):
+        """``(queryset, key field, lastmod field)`` that pages and stats are computed over"""
+        raise NotImplementedError
+
+    def entries(self, low, high):
+        """``(path, lastmod)`` pairs for keys ``low``..``high``"""
+        raise NotImplementedError
+
+    def pages(self, size):
+        """``[(page number, lastmod), ...]`` for every non-empty page"""
+        queryset, key, lastmod = self.source()
+        buckets = (
+            queryset.order_by()
+            .annotate(bucket=(F(key) - 1) / size)
+            .values('bucket')
+            .annotate(lastmod=Max(lastmod))
+            .order_by('bucket')
+        )
+        return [(row['bucket'] + 1, row['lastmod']) for row in buckets]
+
+    def page_stats(self, page, size):
+        """``(row count, latest lastmod)`` of one page, for conditional GET"""
+        queryset, key, lastmod = self.source()
+        low, high = self.bounds(page, size)
+        stats = queryset.filter(**{f'{key}__gte': low, f'{key}__lte': high}).aggregate(
+            count=Count('*'), lastmod=Max(lastmod),
+        )
+        return stats['count'], stats['lastmod']
+
+    @staticmethod
+    def bounds(page, size):
+        return (page - 1) * size + 1, page * size
+
+
+class PhotoSection(Section):
+    name = 'photos'
+    changefreq = 'monthly'
+    priority = '0.6'
+
+    def source(self):
+        return Photo.objects.filter(is_public=True), 'id', 'updated_at'
+
+    def entries(self, low, high):
+        rows = (
+            Photo.objects.filter(is_public=True, id__gte=low, id__lte=high)
+            .order_by('id').values_list('id', 'updated_at')
+        )
+        for pk, updated_at in rows.iterator(chunk_size=2000):
+            yield reverse('userApp:photo_detail', args=[pk]), updated_at
+
+
+class AlbumSection(Section):
+    name = 'albums'
+    priority = '0.6'
+
+    def source(self):
+        return Album.objects.filter(is_public=True), 'id', 'updated_at'
+
+    def entries(self, low, high):
+        rows = (
+            Album.objects.filter(is_public=True, id__gte=low, id__lte=high)
+            .order_by('id').values_list('id', 'updated_at')
+        )
+        for pk, updated_at in rows.iterator(chunk_size=2000):
+            yield reverse('userApp:album_detail', args=[pk]), updated_at
+
+
+class UserSection(Section):
+    """Photographers with public photos, last modified with their newest photo change"""
+
+    name = 'users'
+
+    def source(self):
+        return Photo.objects.filter(is_public=True), 'photographer_id', 'updated_at'
+
+    def entries(self, low, high):
+        rows = (
+            CustomUser.objects.filter(id__gte=low, id__lte=high, photos__is_public=True)
+            .annotate(lastmod=Max('photos__updated_at'))
+            .order_by('id').values_list('username', 'lastmod')
+        )
+        for username, lastmod in rows.iterator(chunk_size=2000):
+            yield reverse('userApp:user_profile', args=[username]), lastmod
+
+
+class TagSection(Section):
+    name = 'tags'
+    priority = '0.4'
+
+    def source(self):
+        return PhotoTag.objects.filter(photo__is_public=True), 'tag_id', 'photo__updated_at'
+
+    def entries(self, low, high):
+        rows = (
+            Tag.objects.filter(id__gte=low, id__lte=high, photo_tags__photo__is_public=True)
+            .annotate(lastmod=Max('photo_tags__photo__updated_at'))
+            .order_by('id').values_list('slug', 'lastmod')
+        )
+        for slug, lastmod in rows.iterator(chunk_size=2000):
+            yield reverse('userApp:tag_photos', args=[slug]), lastmod
+
+
+class PageSection(Section):
+    """Static pages and categories; always a single page"""
+
+    name = 'pages'
+    changefreq = 'daily'
+    priority = '0.8'
+
+    def _latest_photo(self):
+        return Photo.objects.filter(is_public=True).aggregate(lastmod=Max('updated_at'))['lastmod']
+
+    def pages(self, size):
+        lastmod = self._latest_photo()
+        return [(1, lastmod)] if lastmod else []
+
+    def page_stats(self, page, size):
+        if page != 1:
+            return 0, None
+        stats = Category.objects.aggregate(count=Count('*'))
+        return stats['count'] + 1, self._latest_photo()
+
+    def entries(self, low, high):
+        latest_photo = self._latest_photo()
+        latest_album = Album.objects.filter(is_public=True).aggregate(lastmod=Max('updated_at'))['lastmod']
+        yield reverse('userApp:home'), latest_photo
+        yield reverse('userApp:photo_list'), latest_photo
+        yield reverse('userApp:album_list'), latest_album
+        yield reverse('userApp:sitemap'), latest_photo
+        categories = Category.objects.annotate(
+            lastmod=Max('photos__updated_at', filter=Q(photos__is_public=True)),
+        ).order_by('id').values_list('id', 'lastmod', 'created_at')
+        for pk, lastmod, created_at in categories.iterator(chunk_size=2000):
+            yield reverse('userApp:category_photos', args=[pk]), lastmod or created_at
+
+
+SECTIONS = {section.name: section for section in (
+    PageSection(), PhotoSection(), AlbumSection(), UserSection(), TagSection(),
+)}
+
+
+def index_entries():
+    """``[(section, page, lastmod), ...]``, cached until content changes"""
+    size = page_size()
+    versions = '.'.join(str(version) for version in get_versions('photos', 'albums', 'users', 'categories'))
+    key = f'sitemap-index:{size}:{versions}'
+    entries = cache.get(key)
+    if entries is None:
+        entries = [
+            (name, page, lastmod)
+            for name, section in SECTIONS.items()
+            for page, lastmod in section.pages(size)
+        ]
+        cache.set(key, entries, getattr(settings, 'SITEMAP_CACHE_TIMEOUT', 3600))
+    return entries
+
+
+def index_validators():
+    """``(etag, last_modified)`` for the sitemap index"""
+    entries = index_entries()
+    digest = hashlib.md5(repr(entries).encode()).hexdigest()
+    lastmods = [lastmod for _, _, lastmod in entries if lastmod]
+    return f'"{digest}"', max(lastmods) if lastmods else None
+
+
+def page_validators(section, page):
+    """``(etag, last_modified)`` for one child sitemap, or ``(None, None)`` when it is empty"""
+    size = page_size()
+    count, lastmod = section.page_stats(page, size)
+    if not count:
+        return None, None
+    digest = hashlib.md5(f'{section.name}:{page}:{size}:{count}:{w3c_datetime(lastmod)}'.encode()).hexdigest()
+    return f'"{digest}"', lastmod
+
+
+def stream_index(base_url):
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for name, page, lastmod in index_entries():
+        loc = escape(base_url + reverse('userApp:sitemap_section', args=[name, page]))
+        yield f'  <sitemap><loc>{loc}</loc><lastmod>{w3c_datetime(lastmod)}</lastmod></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def stream_section(section, page, base_url):
+    low, high = section.bounds(page, page_size())
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+    tail = f'<changefreq>{section.changefreq}</changefreq><priority>{section.priority}</priority></url>\n'
+    batch = []
+    for path, lastmod in section.entries(low, high):
+        lastmod = f'<lastmod>{w3c_datetime(lastmod)}</lastmod>' if lastmod else ''
+        batch.append(f'  <url><loc>{escape(base_url + path)}</loc>{lastmod}{tail}')
+        if len(batch) >= WRITE_BATCH:
+            yield ''.join(batch)
+            batch = []
+    batch.append('</urlset>\n')
+    yield ''.join(batch)
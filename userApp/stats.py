@@ -0,0 +1,71 @@
+"""
+Site-wide counters served from the ``SiteStats`` snapshot row.
+
+``site_stats()`` is a single-row read. The receivers in ``signals.py`` keep
+the plain counts exact as rows are created and deleted. Changes they cannot
+follow cheaply (``is_public`` toggles, whether a user still has public
+photos) mark the snapshot dirty. A dirty snapshot, or one older than
+``SITE_STATS_MAX_AGE`` seconds, is recomputed by a ``stats.refresh`` task.
+``manage.py refresh_site_stats`` does the same from cron.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Album, Category, CustomUser, Photo, SiteStats
+
+SNAPSHOT_PK = 1
+REFRESH_LOCK_KEY = 'site-stats-refresh'
+
+
+def compute_site_stats():
+    """Exact counts straight from the tables"""
+    return {
+        'users': CustomUser.objects.count(),
+        'categories': Category.objects.count(),
+        'photos': Photo.objects.count(),
+        'public_photos': Photo.objects.filter(is_public=True).count(),
+        'albums': Album.objects.count(),
+        'public_albums': Album.objects.filter(is_public=True).count(),
+        'photographers': Photo.objects.filter(is_public=True).values('photographer').distinct().count(),
+    }
+
+
+def refresh_site_stats():
+    """Recompute the snapshot and return it"""
+    stats, _ = SiteStats.objects.update_or_create(
+        pk=SNAPSHOT_PK, defaults={**compute_site_stats(), 'dirty': False, 'refreshed_at': timezone.now()},
+    )
+    return stats
+
+
+def site_stats():
+    """The current snapshot; schedules a refresh when it is dirty or too old"""
+    stats = SiteStats.objects.filter(pk=SNAPSHOT_PK).first()
+    if stats is None:
+        return refresh_site_stats()
+
+    max_age = getattr(settings, 'SITE_STATS_MAX_AGE', 300)
+    if stats.dirty or stats.refreshed_at < timezone.now() - timedelta(seconds=max_age):
+        # One queued refresh per interval, however many requests see it stale.
+        if cache.add(REFRESH_LOCK_KEY, True, timeout=max_age):
+            from .tasks import enqueue
+
+            enqueue('stats.refresh')
+            if getattr(settings, 'TASK_QUEUE_EAGER', False):
+                stats.refresh_from_db()
+    return stats
+
+
+def adjust_site_stats(dirty=False, **deltas):
+    """Apply counter deltas (and optionally mark the snapshot dirty) in one UPDATE"""
+    # Never below zero, even if the snapshot has drifted.
+    changes = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta}
+    if dirty:
+        changes['dirty'] = True
+    if changes:
+        SiteStats.objects.filter(pk=SNAPSHOT_PK).update(**changes)
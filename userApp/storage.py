@@ -0,0 +1,161 @@
+"""
+Content-addressed media storage.
+
+Uploaded files are stored under the SHA-256 of their bytes instead of their
+original name: ``photos/<name>.jpg`` becomes ``photos/ab/cd/abcd...ef.jpg``.
+Saving a file that is already stored writes nothing and returns the
+existing name, so identical uploads share one blob. Since a name can only
+ever hold one content, media URLs can be cached forever
+(``Cache-Control: immutable``, see ``serve_media``).
+
+Renditions keep their derived names (``photos/ab/cd/renditions/abcd...-640w.webp``)
+and so inherit the blob's hash.
+
+``Photo.image``, ``CustomUser.profile_image`` and ``Album.cover_mosaic`` hold
+references to blobs.
+The receivers in ``signals.py`` count them in ``Blob`` rows. A blob whose count
+drops to zero is only deleted by ``manage.py collect_blobs`` once it has been
+unreferenced for ``BLOB_GC_GRACE`` seconds, which leaves time for an upload
+of the same content to pick it up again. Its renditions go right away
+(``discard_renditions``): a new upload regenerates them.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.views.static import serve
+
+# Directories holding derived files, which keep the name they are given.
+DERIVED_DIRS = ('renditions',)
+EXTENSION_ALIASES = {'.jpeg': '.jpg', '.jpe': '.jpg', '.tif': '.tiff'}
+HASHED_PATH = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/(renditions/)?[0-9a-f]{64}[^/]*$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def is_content_addressed(name):
+    return bool(HASHED_PATH.search(name or ''))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """``FileSystemStorage`` that names uploads by the SHA-256 of their content"""
+
+    def content_name(self, name, content):
+        directory, filename = posixpath.split(name)
+        ext = posixpath.splitext(filename)[1].lower()
+        ext = EXTENSION_ALIASES.get(ext, ext)
+        digest = getattr(content, 'content_hash', None)
+        if not digest:
+            digest = hashlib.sha256()
+            for chunk in content.chunks():
+                digest.update(chunk)
+            content.seek(0)
+            digest = digest.hexdigest()
+        return posixpath.join(directory, digest[:2], digest[2:4], f'{digest}{ext}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            return super().save(name, content, max_length)
+        if set(posixpath.dirname(name).split('/')) & set(DERIVED_DIRS):
+            return super().save(name, content, max_length)
+        name = self.content_name(self.generate_filename(name), content)
+        if not self.exists(name):
+            self._save_atomic(name, content)
+        return name
+
+    def _save_atomic(self, name, content):
+        """Write to a temporary file and rename it into place, so readers never see a partial blob"""
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks():
+                    fh.write(chunk)
+            # mkstemp creates the file private to its owner.
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            # Same bytes either way, so a concurrent writer winning is fine.
+            file_move_safe(temp_path, full_path, allow_overwrite=True)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def acquire_blob(name):
+    """Count one more reference to stored file ``name``"""
+    from .models import Blob
+
+    if not name:
+        return
+    with transaction.atomic():
+        Blob.objects.bulk_create([Blob(name=name)], ignore_conflicts=True)
+        while not Blob.objects.filter(name=name).update(refcount=F('refcount') + 1, orphaned_at=None):
+            # collect_blobs deleted the unreferenced row in between; create it again.
+            Blob.objects.bulk_create([Blob(name=name)], ignore_conflicts=True)
+
+
+def release_blob(name):
+    """Drop one reference to ``name``; unreferenced blobs are left for ``collect_blobs``"""
+    from .models import Blob
+
+    if not name:
+        return
+    Blob.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+    Blob.objects.filter(name=name, refcount=0, orphaned_at__isnull=True).update(orphaned_at=timezone.now())
+
+
+def discard_renditions(storage, name, widths):
+    """Delete the renditions of ``name`` as soon as no field references its blob any more"""
+    from .models import Blob
+    from .renditions import delete_renditions
+
+    # Duplicates share a blob and its renditions; they stay while one is referenced.
+    if name and widths and not Blob.objects.filter(name=name, refcount__gt=0).exists():
+        delete_renditions(storage, name, widths)
+
+
+def delete_blob_files(storage, name):
+    """Delete a stored file and any renditions generated from it"""
+    from .renditions import FORMATS, mosaic_widths, photo_widths, profile_widths, rendition_name
+
+    for width in set(photo_widths()) | set(profile_widths()) | set(mosaic_widths()):
+        for fmt in FORMATS:
+            storage.delete(rendition_name(name, width, fmt))
+    storage.delete(name)
+
+
+def collect_blobs(grace=None):
+    """Delete blobs unreferenced for longer than ``grace`` seconds; returns how many went"""
+    from django.core.files.storage import default_storage
+
+    from .models import Blob
+
+    grace = getattr(settings, 'BLOB_GC_GRACE', 3600) if grace is None else grace
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    collected = 0
+    for blob in Blob.objects.filter(refcount=0, orphaned_at__lte=cutoff).iterator():
+        # Conditional delete: a new reference since the query keeps the blob.
+        deleted, _ = Blob.objects.filter(pk=blob.pk, refcount=0).delete()
+        if deleted:
+            delete_blob_files(default_storage, blob.name)
+            collected += 1
+    return collected
+
+
+def serve_media(request, path, document_root=None):
+    """``django.views.static.serve`` with far-future caching for content-addressed files"""
+    response = serve(request, path, document_root=document_root)
+    if response.status_code == 200:
+        response['Cache-Control'] = IMMUTABLE if is_content_addressed(path) else 'public, max-age=3600'
+    return response
@@ -0,0 +1,76 @@
+"""
+Normalized photo tags.
+
+``Photo.tags`` stays the comma-separated field people type into; on save the
+string is parsed into ``Tag`` rows linked through ``PhotoTag``, which is what
+tag pages and the tag cloud query. Tags are matched by slug, so "Sunset",
+"sunset" and " sunset " are one tag.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.text import slugify
+
+TAG_NAME_MAX_LENGTH = 100
+POPULAR_TAGS_CACHE_KEY = 'popular-tags'
+
+
+def tag_slug(name):
+    return slugify(name, allow_unicode=True)[:TAG_NAME_MAX_LENGTH]
+
+
+def parse_tags(value):
+    """``[(name, slug), ...]`` for a comma-separated tag string, first spelling wins"""
+    tags = {}
+    for name in (value or '').split(','):
+        name = name.strip()[:TAG_NAME_MAX_LENGTH]
+        slug = tag_slug(name)
+        if slug and slug not in tags:
+            tags[slug] = name
+    return [(name, slug) for slug, name in tags.items()]
+
+
+def sync_photo_tags(photo):
+    """Make ``photo``'s PhotoTag rows match its ``tags`` string; returns True if they changed"""
+    from .models import PhotoTag, Tag
+
+    parsed = dict((slug, name) for name, slug in parse_tags(photo.tags))
+    current = dict(PhotoTag.objects.filter(photo=photo).values_list('tag__slug', 'tag_id'))
+
+    stale = [tag_id for slug, tag_id in current.items() if slug not in parsed]
+    missing = [slug for slug in parsed if slug not in current]
+    if stale:
+        PhotoTag.objects.filter(photo=photo, tag_id__in=stale).delete()
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(name=parsed[slug], slug=slug) for slug in missing], ignore_conflicts=True,
+        )
+        tags = Tag.objects.filter(slug__in=missing).values_list('pk', flat=True)
+        PhotoTag.objects.bulk_create([PhotoTag(photo=photo, tag_id=tag_id) for tag_id in tags], ignore_conflicts=True)
+    return bool(stale or missing)
+
+
+def popular_tags(limit=None):
+    """
+    Most used tags on public photos as ``[{'name', 'slug', 'count'}, ...]``.
+
+    The aggregate is cached for ``TAG_CLOUD_CACHE_TIMEOUT`` seconds and
+    dropped whenever photo tags change.
+    """
+    from .models import Tag
+
+    tags = cache.get(POPULAR_TAGS_CACHE_KEY)
+    if tags is None:
+        size = getattr(settings, 'TAG_CLOUD_SIZE', 40)
+        tags = list(
+            Tag.objects.annotate(count=Count('photo_tags', filter=Q(photo_tags__photo__is_public=True)))
+            .filter(count__gt=0)
+            .order_by('-count', 'name')
+            .values('name', 'slug', 'count')[:size]
+        )
+        cache.set(POPULAR_TAGS_CACHE_KEY, tags, getattr(settings, 'TAG_CLOUD_CACHE_TIMEOUT', 600))
+    return tags[:limit] if limit else tags
+
+
+def invalidate_popular_tags():
+    cache.delete(POPULAR_TAGS_CACHE_KEY)
@@ -0,0 +1,177 @@
+"""
+A small database-backed task queue.
+
+Views call ``enqueue()`` to record work in the ``Task`` table and return
+immediately; ``manage.py run_worker`` claims queued rows and executes the
+registered handlers in a process pool. With ``TASK_QUEUE_EAGER = True`` tasks
+run inline instead, which is handy for tests and single-process setups.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+
+from .caching import bump
+from .exif import read_exif, settings_summary
+from .feed import fan_out_photo
+from .fingerprints import content_hash, perceptual_hash
+from .models import Album, CustomUser, Photo, Task
+from .mosaics import generate_album_mosaic
+from .renditions import generate_photo_renditions, generate_profile_renditions
+from .stats import refresh_site_stats
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+def task(name, on_failure=None):
+    """Register ``func`` as the handler for task ``name``"""
+    def decorator(func):
+        REGISTRY[name] = (func, on_failure)
+        return func
+    return decorator
+
+
+def enqueue(name, max_attempts=3, **payload):
+    """Queue ``name`` to run with ``payload`` as keyword arguments"""
+    if name not in REGISTRY:
+        raise ValueError(f'Unknown task: {name}')
+    job = Task.objects.create(name=name, payload=payload, max_attempts=max_attempts)
+    if getattr(settings, 'TASK_QUEUE_EAGER', False):
+        Task.objects.filter(pk=job.pk).update(status=Task.RUNNING, attempts=F('attempts') + 1)
+        run_task(job.pk)
+        job.refresh_from_db()
+    return job
+
+
+def claim_tasks(limit):
+    """
+    Atomically move up to ``limit`` due tasks from queued to running and
+    return their ids. The conditional UPDATE makes claiming safe across
+    several worker processes without row locks, which SQLite lacks.
+    """
+    candidates = Task.objects.filter(
+        status=Task.QUEUED, run_after__lte=timezone.now()
+    ).values_list('pk', flat=True)[:limit * 2]
+
+    claimed = []
+    for pk in candidates:
+        if Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now()
+        ):
+            claimed.append(pk)
+            if len(claimed) >= limit:
+                break
+    return claimed
+
+
+def requeue_stale(older_than):
+    """Put tasks left running by a crashed worker back on the queue"""
+    cutoff = timezone.now() - older_than
+    return Task.objects.filter(status=Task.RUNNING, updated_at__lt=cutoff).update(
+        status=Task.QUEUED, updated_at=timezone.now()
+    )
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=30 * 2 ** max(attempts - 1, 0))
+
+
+def run_task(task_id):
+    """Execute one claimed task and record the outcome. Returns True on success."""
+    job = Task.objects.get(pk=task_id)
+    handler, on_failure = REGISTRY[job.name]
+    try:
+        handler(**job.payload)
+    except Exception as exc:
+        logger.exception('Task %s failed (attempt %s/%s)', job, job.attempts, job.max_attempts)
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Task.FAILED
+            if on_failure:
+                on_failure(exc, **job.payload)
+        else:
+            job.status = Task.QUEUED
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+        job.save(update_fields=['status', 'run_after', 'last_error', 'updated_at'])
+        return False
+
+    job.status = Task.DONE
+    job.last_error = ''
+    job.save(update_fields=['status', 'last_error', 'updated_at'])
+    return True
+
+
+def hash_file(fieldfile):
+    with fieldfile.storage.open(fieldfile.name, 'rb') as fh:
+        return content_hash(fh)
+
+
+def _photo_failed(exc, photo_id):
+    Photo.objects.filter(pk=photo_id).update(processing_status=Photo.PROCESSING_FAILED)
+
+
+@task('photo.process', on_failure=_photo_failed)
+def process_photo(photo_id):
+    """Post-upload work for a photo: metadata, fingerprints and renditions"""
+    photo = Photo.objects.filter(pk=photo_id).first()
+    if photo is None or not photo.image:
+        return
+    Photo.objects.filter(pk=photo_id).update(processing_status=Photo.PROCESSING_RUNNING)
+
+    with photo.image.storage.open(photo.image.name, 'rb') as fh:
+        with Image.open(fh) as image:
+            width, height = image.size
+            phash = perceptual_hash(image)
+            exif = read_exif(image)
+    digest = hash_file(photo.image)
+    generate_photo_renditions(photo)
+
+    Photo.objects.filter(pk=photo_id).update(
+        width=width,
+        height=height,
+        content_hash=digest,
+        phash=phash,
+        processing_status=Photo.PROCESSING_READY,
+        exif_scanned=True,
+        **exif,
+    )
+    summary = settings_summary(exif)
+    if summary:
+        # Fill in the free-text field only where the photographer left it empty.
+        Photo.objects.filter(pk=photo_id, camera_settings='').update(camera_settings=summary[:200])
+    # Cached cards still point at the original image; pick up the renditions.
+    bump('photos')
+
+
+@task('user.profile_image')
+def process_profile_image(user_id):
+    user = CustomUser.objects.filter(pk=user_id).first()
+    if user is None or not user.profile_image:
+        return
+    generate_profile_renditions(user)
+    bump('users')
+
+
+@task('album.mosaic')
+def build_album_mosaic(album_id):
+    album = Album.objects.filter(pk=album_id).first()
+    if album is None:
+        return
+    generate_album_mosaic(album)
+    bump('albums')
+
+
+@task('stats.refresh')
+def refresh_stats():
+    refresh_site_stats()
+
+
+@task('feed.fan_out')
+def fan_out_feed(photo_id):
+    fan_out_photo(photo_id)
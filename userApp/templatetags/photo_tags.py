@@ -0,0 +1,38 @@
+from django import template
+from django.utils.html import format_html
+
+from ..renditions import FORMATS
+
+register = template.Library()
+
+
+@register.filter
+def srcset(renditions, fmt='jpeg'):
+    """``{{ photo.image_renditions|srcset:"webp" }}``"""
+    if not renditions:
+        return ''
+    return renditions.srcset(fmt)
+
+
+@register.simple_tag
+def responsive_image(renditions, alt='', css_class='', sizes='100vw', target=640, loading='lazy'):
+    """
+    Render a <picture> with a WebP <source> and a JPEG <img> fallback.
+
+    Usage: {% responsive_image photo.image_renditions alt=photo.title css_class="w-full h-48" sizes="25vw" %}
+    """
+    if not renditions:
+        return ''
+    if not renditions.widths:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}">',
+            renditions.fieldfile.url, alt, css_class, loading,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="{}" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}" decoding="async">'
+        '</picture>',
+        FORMATS['webp']['mime'], renditions.srcset('webp'), sizes,
+        renditions.fallback_url(target), renditions.srcset('jpeg'), sizes, alt, css_class, loading,
+    )
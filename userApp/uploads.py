@@ -0,0 +1,228 @@
+"""
+Streaming image upload handling.
+
+``StreamingImageUploadHandler`` (installed through ``FILE_UPLOAD_HANDLERS``)
+replaces Django's memory and temporary-file handlers. Each uploaded file is
+written to a temporary file chunk by chunk while its SHA-256 is computed, so
+``fingerprints.content_hash`` and the content-addressed storage never read
+it again.
+
+Uploads are checked as they arrive rather than after the whole body has
+been buffered and handed to Pillow:
+
+* the ``Content-Length`` of the request, and then the bytes actually
+  received, against ``UPLOAD_MAX_BYTES``;
+* the image dimensions, read from the header in the first chunks with a
+  lazy ``Image.open`` (no pixel data is decoded), against
+  ``UPLOAD_MAX_PIXELS``, which catches decompression bombs;
+* files still not recognised as an image after ``UPLOAD_HEADER_PEEK`` bytes.
+
+A rejected file stops being written and its temporary file is removed; the
+rest of the request is read and discarded. The handler hands the form a
+``RejectedUpload`` carrying the reason, which ``UploadImageField`` turns into
+a validation error next to the field.
+
+Every upload is counted in the cache (``UPLOAD_METRICS_CACHE``) by outcome,
+with bytes and receive time, so ``upload_metrics()`` and
+``manage.py upload_stats`` can report throughput.
+"""
+import hashlib
+import logging
+import time
+import warnings
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'uploads'
+OUTCOMES = ('accepted', 'too_large', 'too_many_pixels', 'not_an_image')
+# Room for the other form fields and multipart headers around the file.
+FORM_OVERHEAD = 64 * 1024
+
+
+def max_bytes():
+    return getattr(settings, 'UPLOAD_MAX_BYTES', 25 * 1024 * 1024)
+
+
+def max_pixels():
+    return getattr(settings, 'UPLOAD_MAX_PIXELS', 100_000_000)
+
+
+def header_peek():
+    return getattr(settings, 'UPLOAD_HEADER_PEEK', 1024 * 1024)
+
+
+def image_size(header):
+    """
+    ``(width, height)`` from the start of an image file, None if it is not
+    recognised (yet). Raises ``Image.DecompressionBombError`` for images over
+    twice Pillow's own pixel limit.
+    """
+    with warnings.catch_warnings():
+        # Pillow warns about large images; the limit is enforced by the caller.
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            with Image.open(BytesIO(header)) as image:
+                return image.size
+        except (OSError, ValueError, SyntaxError):
+            return None
+
+
+class RejectedUpload(UploadedFile):
+    """Placeholder for an upload refused while streaming; holds no content"""
+
+    def __init__(self, name, content_type, size, outcome, message):
+        super().__init__(BytesIO(), name, content_type, size)
+        self.outcome = outcome
+        self.rejection = message
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    """Stream uploads to a temporary file while hashing and enforcing the size limits"""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request_length = content_length or 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.started = time.monotonic()
+        self.received = 0
+        self.digest = hashlib.sha256()
+        self.header = bytearray()
+        self.checked = False
+        self.outcome = self.message = None
+        self.file = None
+        limit = max_bytes()
+        if getattr(self, 'request_length', 0) > limit + FORM_OVERHEAD:
+            # Refuse before writing anything.
+            self.reject('too_large', f'Images must be at most {filesizeformat(limit)}.')
+            return
+        self.file = TemporaryUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra,
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.outcome is not None:
+            return None
+        if self.received > max_bytes():
+            self.reject('too_large', f'Images must be at most {filesizeformat(max_bytes())}.')
+            return None
+        if not self.checked:
+            self.header += raw_data
+            self.check_header(final=False)
+            if self.outcome is not None:
+                return None
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def check_header(self, final):
+        limit = max_pixels()
+        try:
+            size = image_size(bytes(self.header))
+        except Image.DecompressionBombError:
+            self.reject('too_many_pixels', f'Images must be at most {limit / 1e6:g} megapixels.')
+            return
+        if size is None:
+            # Truncated files are left to the form's own image validation.
+            if not final and len(self.header) >= header_peek():
+                self.reject('not_an_image', 'Upload a valid image.')
+            return
+        self.checked = True
+        self.header = bytearray()
+        width, height = size
+        if width * height > limit:
+            self.reject(
+                'too_many_pixels',
+                f'Images must be at most {limit / 1e6:g} megapixels; this one is {width}x{height}.',
+            )
+
+    def reject(self, outcome, message):
+        self.outcome, self.message = outcome, message
+        self.header = bytearray()
+        self.discard()
+
+    def discard(self):
+        if self.file is not None:
+            # Closing a TemporaryUploadedFile deletes it.
+            self.file.close()
+            self.file = None
+
+    def file_complete(self, file_size):
+        if self.outcome is None and not self.checked:
+            self.check_header(final=True)
+        elapsed = time.monotonic() - self.started
+        if self.outcome is not None:
+            record_upload(self.outcome, self.received, elapsed)
+            logger.info('Rejected upload %r (%s, %s bytes)', self.file_name, self.outcome, self.received)
+            return RejectedUpload(self.file_name, self.content_type, self.received, self.outcome, self.message)
+        record_upload('accepted', file_size, elapsed)
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.digest.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        self.discard()
+
+
+class UploadImageField(forms.ImageField):
+    """``ImageField`` reporting why the upload handler refused a file"""
+
+    def to_python(self, data):
+        rejection = getattr(data, 'rejection', None)
+        if rejection:
+            raise forms.ValidationError(rejection, code=data.outcome)
+        return super().to_python(data)
+
+
+def _cache():
+    return caches[getattr(settings, 'UPLOAD_METRICS_CACHE', 'default')]
+
+
+def _incr(cache, key, amount):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, timeout=None)
+
+
+def record_upload(outcome, size, seconds):
+    cache = _cache()
+    _incr(cache, f'{KEY_PREFIX}:{outcome}:count', 1)
+    _incr(cache, f'{KEY_PREFIX}:{outcome}:bytes', size)
+    _incr(cache, f'{KEY_PREFIX}:{outcome}:ms', round(seconds * 1000))
+
+
+def upload_metrics():
+    """Per-outcome ``count``, ``bytes``, ``seconds`` and ``throughput`` (bytes/s) since the last reset"""
+    keys = [f'{KEY_PREFIX}:{outcome}:{field}' for outcome in OUTCOMES for field in ('count', 'bytes', 'ms')]
+    values = _cache().get_many(keys)
+    metrics = {}
+    for outcome in OUTCOMES:
+        count = values.get(f'{KEY_PREFIX}:{outcome}:count', 0)
+        size = values.get(f'{KEY_PREFIX}:{outcome}:bytes', 0)
+        seconds = values.get(f'{KEY_PREFIX}:{outcome}:ms', 0) / 1000
+        metrics[outcome] = {
+            'count': count,
+            'bytes': size,
+            'seconds': seconds,
+            'throughput': size / seconds if seconds else None,
+        }
+    return metrics
+
+
+def reset_upload_metrics():
+    _cache().delete_many(
+        [f'{KEY_PREFIX}:{outcome}:{field}' for outcome in OUTCOMES for field in ('count', 'bytes', 'ms')]
+    )
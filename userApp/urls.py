@@ -7,13 +7,19 @@ urlpatterns = [
     # Main pages
     path('', views.home, name='home'),
     path('photos/', views.photo_list, name='photo_list'),
+    path('photos/scroll/', views.photo_list_scroll, name='photo_list_scroll'),
+    path('feed/', views.feed, name='feed'),
     path('photo/<int:photo_id>/', views.photo_detail, name='photo_detail'),
+    path('photo/<int:photo_id>/comments/', views.photo_comments, name='photo_comments'),
     
     # Photo management
     path('photo/upload/', views.photo_upload, name='photo_upload'),
     path('photo/<int:photo_id>/edit/', views.photo_edit, name='photo_edit'),
     path('photo/<int:photo_id>/delete/', views.photo_delete, name='photo_delete'),
     path('photo/<int:photo_id>/like/', views.like_photo, name='like_photo'),
+    path('photos/liked/', views.liked_photos, name='liked_photos'),
+    path('photos/likes/bulk/', views.bulk_like, name='bulk_like'),
+    path('photos/autocomplete/', views.photo_autocomplete, name='photo_autocomplete'),
     
     # User profile URLs
     path('profile/edit/', views.profile_edit, name='profile_edit'), # Moved this line up
@@ -24,11 +30,16 @@ urlpatterns = [
     # Albums
     path('albums/', views.album_list, name='album_list'),
     path('album/<int:album_id>/', views.album_detail, name='album_detail'),
+    path('album/<int:album_id>/photos/', views.album_photos_update, name='album_photos_update'),
+    path('album/<int:album_id>/picker/', views.album_photo_picker, name='album_photo_picker'),
     path('album/create/', views.album_create, name='album_create'),
     
     # Categories
     path('category/<int:category_id>/', views.category_photos, name='category_photos'),
     
+    # Tags
+    path('tag/<str:slug>/', views.tag_photos, name='tag_photos'),
+    
     # Search
     path('search/', views.search_results, name='search_results'),
     
@@ -43,5 +54,6 @@ urlpatterns = [
     
     # SEO URLs
     path('sitemap.xml', views.sitemap_xml, name='sitemap_xml'),
+    path('sitemap-<slug:section>-<int:page>.xml', views.sitemap_section, name='sitemap_section'),
     path('robots.txt', views.robots_txt, name='robots_txt'),
 ]
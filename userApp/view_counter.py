@@ -0,0 +1,131 @@
+"""
+Buffered, write-coalescing photo view counter.
+
+``photo_detail`` records a view with ``record_view()`` instead of saving the
+photo. Pending increments are kept in the cache (``VIEW_COUNTER_CACHE``) and
+written back in batches with ``UPDATE ... SET views = views + n`` once
+``VIEW_COUNTER_FLUSH_THRESHOLD`` views are pending or
+``VIEW_COUNTER_FLUSH_INTERVAL`` seconds have passed, so a page view is no
+longer a full-row write.
+
+With the default local-memory cache the buffer is per process and is flushed
+at interpreter exit. With a shared cache backend, ``manage.py flush_views``
+can drain every process's buffer, e.g. from a shutdown hook.
+"""
+import atexit
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+KEY_PREFIX = 'photo-views'
+
+_lock = threading.Lock()
+_dirty = set()
+_pending = 0
+_last_flush = time.monotonic()
+
+
+def _cache():
+    return caches[getattr(settings, 'VIEW_COUNTER_CACHE', 'default')]
+
+
+def _key(photo_id):
+    return f'{KEY_PREFIX}:{photo_id}'
+
+
+def record_view(photo_id):
+    """Count one view of ``photo_id``, flushing the buffer when it is due"""
+    global _pending
+    cache = _cache()
+    key = _key(photo_id)
+    # No expiry: buffered views must survive until the next flush.
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr(); start the count again.
+        cache.set(key, 1, timeout=None)
+
+    with _lock:
+        _dirty.add(photo_id)
+        _pending += 1
+        due = (
+            _pending >= getattr(settings, 'VIEW_COUNTER_FLUSH_THRESHOLD', 50)
+            or time.monotonic() - _last_flush >= getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 30)
+        )
+    if due:
+        flush()
+
+
+def pending_views(photo_id):
+    """Views recorded for ``photo_id`` that are not in the database yet"""
+    return _cache().get(_key(photo_id)) or 0
+
+
+def flush(photo_ids=None):
+    """
+    Write buffered views to the database and return how many were written.
+
+    Without ``photo_ids`` only the photos this process has seen are flushed.
+    Photos with the same pending count share a single UPDATE statement.
+    """
+    global _pending, _last_flush
+    from .models import Photo
+
+    with _lock:
+        if photo_ids is None:
+            photo_ids = list(_dirty)
+            _dirty.clear()
+        _pending = 0
+        _last_flush = time.monotonic()
+    if not photo_ids:
+        return 0
+
+    cache = _cache()
+    counts = cache.get_many([_key(photo_id) for photo_id in photo_ids])
+
+    by_increment = defaultdict(list)
+    for photo_id in photo_ids:
+        count = counts.get(_key(photo_id)) or 0
+        if count <= 0:
+            continue
+        # Subtract what we are about to write rather than deleting the key,
+        # so views recorded concurrently by other requests are kept.
+        cache.decr(_key(photo_id), count)
+        by_increment[count].append(photo_id)
+
+    with transaction.atomic():
+        for increment, ids in by_increment.items():
+            Photo.objects.filter(pk__in=ids).update(views=F('views') + increment)
+    return sum(increment * len(ids) for increment, ids in by_increment.items())
+
+
+def flush_all(batch_size=1000):
+    """Flush buffered views for every photo (used by ``manage.py flush_views``)"""
+    from .models import Photo
+
+    total = 0
+    batch = []
+    for photo_id in Photo.objects.values_list('pk', flat=True).order_by().iterator(chunk_size=batch_size):
+        batch.append(photo_id)
+        if len(batch) >= batch_size:
+            total += flush(batch)
+            batch = []
+    total += flush(batch)
+    return total
+
+
+@atexit.register
+def _flush_at_exit():
+    if not _dirty:
+        return
+    try:
+        flush()
+    except Exception:
+        # The database may already be gone during interpreter shutdown.
+        pass
@@ -1,22 +1,45 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponseForbidden, HttpResponse, StreamingHttpResponse
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import login, authenticate, logout
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_GET, require_POST
 from django.contrib.auth.forms import AuthenticationForm
-from django.utils import timezone
 from django.template.loader import render_to_string
-from .models import CustomUser, Photo, Album, Category, Comment, Follow
+from django.urls import reverse
+from . import sitemaps
+from .albums import update_album_photos
+from .caching import cache_anonymous_page
+from .choices import own_photos
+from .facets import apply_facets, facet_counts, facet_selection
+from .feed import feed_page
+from .fingerprints import reuse_image
+from .interactions import MAX_BULK_IDS, Like, set_likes, toggle_follow, toggle_like
+from .models import CustomUser, Photo, PhotoQuerySet, Album, AlbumPhoto, Category, Comment, Follow, Tag
+from .mosaics import preview_prefetch
+from .pagination import KeysetPaginator, paginate
+from .replicas import read_from_replica
+from .related import related_photos
+from .search import RELEVANCE_ORDERING, search_photos
+from .stats import site_stats
+from .tagging import popular_tags
 from .forms import PhotoUploadForm, AlbumForm, UserProfileForm, CommentForm, CustomUserCreationForm
+from .tasks import enqueue
+from .view_counter import pending_views, record_view
 import json
 
+@read_from_replica
+@cache_anonymous_page('photos', 'users', 'categories')
 def home(request):
     """Home page with featured photos and recent uploads"""
-    featured_photos = Photo.objects.filter(is_public=True).order_by('-views', '-created_at')[:12]
-    recent_photos = Photo.objects.filter(is_public=True).order_by('-created_at')[:8]
+    featured_photos = Photo.objects.filter(is_public=True).for_grid(request.user).order_by('-views', '-created_at')[:12]
+    recent_photos = Photo.objects.filter(is_public=True).for_grid(request.user).order_by('-created_at')[:8]
     categories = Category.objects.annotate(photo_count=Count('photos')).order_by('-photo_count')[:6]
     
     # SEO context
@@ -40,41 +63,55 @@ def home(request):
     }
     return render(request, 'userApp/home.html', context)
 
-def photo_list(request):
-    """Display all public photos with filtering and pagination"""
+def _filtered_photos(request):
+    """
+    Public photos filtered and sorted by the photo_list query parameters.
+
+    Also returns the photos before facet filters, which facet counts are
+    computed from, and the facet selection.
+    """
     photos = Photo.objects.filter(is_public=True)
     
-    # Filtering
-    category_id = request.GET.get('category')
-    if category_id:
-        photos = photos.filter(category_id=category_id)
+    # Camera metadata read from EXIF (camera itself is a facet)
+    lens = request.GET.get('lens')
+    if lens:
+        photos = photos.filter(lens=lens)
+    for param, lookup in (('iso_min', 'iso__gte'), ('iso_max', 'iso__lte')):
+        value = request.GET.get(param, '')
+        if value.isdigit():
+            photos = photos.filter(**{lookup: int(value)})
     
     search_query = request.GET.get('search')
     if search_query:
-        photos = photos.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(tags__icontains=search_query) |
-            Q(photographer__username__icontains=search_query)
-        )
+        photos = search_photos(photos, search_query)
     
-    # Sorting
+    # Facets: category, tag, camera, location, date range
+    selection = facet_selection(request.GET)
+    base = photos
+    photos = apply_facets(photos, selection).for_grid(request.user)
+    
+    # Sorting (newest, oldest, popular, liked)
     sort_by = request.GET.get('sort', 'newest')
-    if sort_by == 'oldest':
-        photos = photos.order_by('created_at')
-    elif sort_by == 'popular':
-        photos = photos.order_by('-views', '-likes__count')
-    elif sort_by == 'liked':
-        photos = photos.order_by('-likes__count', '-created_at')
-    else:  # newest
-        photos = photos.order_by('-created_at')
+    photos = photos.ranked(sort_by)
+    return photos, base, selection, search_query, sort_by
+
+@read_from_replica
+@cache_anonymous_page('photos', 'users', 'categories')
+def photo_list(request):
+    """Display all public photos with filtering and pagination"""
+    photos, base, selection, search_query, sort_by = _filtered_photos(request)
     
-    # Pagination
-    paginator = Paginator(photos, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination (numbered for small result sets, keyset cursors otherwise)
+    page_obj = paginate(request, photos, PhotoQuerySet.sort_ordering(sort_by))
     
-    categories = Category.objects.all()
+    # Facet counts (one grouped query, cached per filter combination)
+    base_key = [request.GET.get(param, '') for param in ('search', 'lens', 'iso_min', 'iso_max')]
+    facets = facet_counts(base, selection, base_key)
+    category_counts = {item['value']: item['count'] for item in facets['category']}
+    categories = [
+        {'id': category.id, 'name': category.name, 'count': category_counts.get(str(category.id), 0)}
+        for category in Category.objects.all()
+    ]
     
     # SEO context
     seo_context = {
@@ -92,20 +129,89 @@ def photo_list(request):
     context = {
         'page_obj': page_obj,
         'categories': categories,
-        'current_category': category_id,
+        'current_category': selection.get('category'),
+        'facets': facets,
+        'selection': selection,
+        'current_lens': request.GET.get('lens', ''),
+        'iso_min': request.GET.get('iso_min', ''),
+        'iso_max': request.GET.get('iso_max', ''),
         'search_query': search_query,
         'sort_by': sort_by,
+        'popular_tags': popular_tags(limit=20),
         **seo_context,
     }
     return render(request, 'userApp/photo_list.html', context)
 
+@read_from_replica
+def photo_list_scroll(request):
+    """JSON feed of photo_list pages for infinite scrolling, always cursor-paginated"""
+    photos, _, _, _, sort_by = _filtered_photos(request)
+    page_obj = KeysetPaginator(photos, 12, PhotoQuerySet.sort_ordering(sort_by)).get_page(request.GET.get('cursor'))
+    
+    results = []
+    for photo in page_obj:
+        renditions = photo.image_renditions
+        results.append({
+            'id': photo.id,
+            'title': photo.title,
+            'url': reverse('userApp:photo_detail', args=[photo.id]),
+            'image_url': renditions.fallback_url(),
+            'srcset': renditions.srcset('webp'),
+            'photographer': photo.photographer.username,
+            'category': photo.category.name if photo.category else None,
+            'views': photo.views,
+            'like_count': photo.like_count,
+            'comment_count': photo.comment_count,
+            'is_liked': photo.is_liked,
+            'created_at': photo.created_at.isoformat(),
+        })
+    
+    return JsonResponse({
+        'results': results,
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+    })
+
+@login_required
+def feed(request):
+    """Public photos from the photographers the user follows, newest first"""
+    page_obj = feed_page(request.user, request.GET.get('cursor'))
+    
+    # SEO context
+    seo_context = {
+        'meta_title': 'Your Feed - PhotoShare',
+        'meta_description': 'The latest photos from the photographers you follow on PhotoShare.',
+        'meta_keywords': 'photo feed, followed photographers, latest photos',
+        'og_title': 'Your Feed - PhotoShare',
+        'og_description': 'The latest photos from the photographers you follow on PhotoShare.',
+        'og_type': 'website',
+        'twitter_title': 'Your Feed - PhotoShare',
+        'twitter_description': 'The latest photos from the photographers you follow on PhotoShare.',
+        'schema_type': 'CollectionPage',
+    }
+    
+    context = {
+        'page_obj': page_obj,
+        'following_count': request.user.following_count,
+        **seo_context,
+    }
+    return render(request, 'userApp/feed.html', context)
+
+def _comment_page(photo, cursor=None):
+    """One keyset page of ``photo``'s comments, newest first, authors joined"""
+    comments = photo.comments.select_related('user')
+    per_page = getattr(settings, 'COMMENTS_PER_PAGE', 20)
+    return KeysetPaginator(comments, per_page, Comment._meta.ordering).get_page(cursor)
+
 def photo_detail(request, photo_id):
     """Display individual photo with comments and details"""
-    photo = get_object_or_404(Photo, id=photo_id, is_public=True)
+    photo = get_object_or_404(Photo.objects.with_is_liked(request.user), id=photo_id, is_public=True)
     
-    # Increment view count
-    photo.views += 1
-    photo.save()
+    # Increment view count (buffered, written back in batches). Count what is
+    # pending first: if record_view() flushes, it is no longer in the buffer.
+    pending = pending_views(photo.id)
+    record_view(photo.id)
+    photo.views += pending + 1
     
     # Handle comment submission
     if request.method == 'POST' and request.user.is_authenticated:
@@ -114,16 +220,18 @@ def photo_detail(request, photo_id):
             comment = comment_form.save(commit=False)
             comment.photo = photo
             comment.user = request.user
-            comment.save()
+            with transaction.atomic():
+                comment.save()
             messages.success(request, 'Comment added successfully!')
             return redirect('userApp:photo_detail', photo_id=photo.id)
     else:
         comment_form = CommentForm()
     
-    # Get related photos
-    related_photos = Photo.objects.filter(
-        Q(category=photo.category) | Q(photographer=photo.photographer)
-    ).exclude(id=photo.id).filter(is_public=True)[:6]
+    # First page of comments; the rest load on demand from photo_comments
+    comments_page = _comment_page(photo)
+    
+    # Get related photos (precomputed by manage.py compute_related_photos)
+    related = related_photos(photo, limit=6)
     
     # SEO context
     seo_context = {
@@ -143,30 +251,62 @@ def photo_detail(request, photo_id):
     context = {
         'photo': photo,
         'comment_form': comment_form,
-        'related_photos': related_photos,
+        'comments_page': comments_page,
+        'related_photos': related,
         **seo_context,
     }
     return render(request, 'userApp/photo_detail.html', context)
 
+@require_GET
+def photo_comments(request, photo_id):
+    """JSON page of a photo's comments for the "load more" button, always cursor-paginated"""
+    photo = get_object_or_404(Photo.objects.only('pk', 'comment_count'), id=photo_id, is_public=True)
+    page_obj = _comment_page(photo, request.GET.get('cursor'))
+    
+    results = []
+    for comment in page_obj:
+        results.append({
+            'id': comment.id,
+            'user': comment.user.username,
+            'content': comment.content,
+            'created_at': comment.created_at.isoformat(),
+            'html': render_to_string('userApp/comment.html', {'comment': comment}, request),
+        })
+    
+    return JsonResponse({
+        'results': results,
+        'next_cursor': page_obj.next_cursor,
+        'comment_count': photo.comment_count,
+    })
+
 @login_required
 def photo_upload(request):
     """Upload new photo"""
     if request.method == 'POST':
-        form = PhotoUploadForm(request.POST, request.FILES)
+        form = PhotoUploadForm(request.POST, request.FILES, photographer=request.user)
         if form.is_valid():
             photo = form.save(commit=False)
             photo.photographer = request.user
-            photo.save()
+            photo.content_hash, photo.phash = form.fingerprint
+            if form.duplicate_of:
+                # Identical file already stored and processed: skip both.
+                reuse_image(photo, form.duplicate_of)
+                photo.save()
+            else:
+                photo.processing_status = Photo.PROCESSING_PENDING
+                photo.save()
+                enqueue('photo.process', photo_id=photo.id)
             messages.success(request, 'Photo uploaded successfully!')
             return redirect('userApp:photo_detail', photo_id=photo.id)
     else:
-        form = PhotoUploadForm()
+        form = PhotoUploadForm(photographer=request.user)
     
     # Calculate user statistics for the sidebar
-    user_photos = request.user.photos.all()
-    total_photos = user_photos.count()
-    public_photos = user_photos.filter(is_public=True).count()
-    total_views = sum(photo.views for photo in user_photos)
+    stats = request.user.photos.aggregate(
+        total_photos=Count('id'),
+        public_photos=Count('id', filter=Q(is_public=True)),
+        total_views=Coalesce(Sum('views'), 0),
+    )
     
     # SEO context
     seo_context = {
@@ -183,9 +323,7 @@ def photo_upload(request):
     
     context = {
         'form': form,
-        'total_photos': total_photos,
-        'public_photos': public_photos,
-        'total_views': total_views,
+        **stats,
         **seo_context,
     }
     return render(request, 'userApp/photo_upload.html', context)
@@ -196,13 +334,27 @@ def photo_edit(request, photo_id):
     photo = get_object_or_404(Photo, id=photo_id, photographer=request.user)
     
     if request.method == 'POST':
-        form = PhotoUploadForm(request.POST, request.FILES, instance=photo)
+        form = PhotoUploadForm(request.POST, request.FILES, instance=photo, photographer=request.user)
         if form.is_valid():
-            form.save()
+            photo = form.save(commit=False)
+            image_changed = 'image' in form.changed_data
+            if image_changed:
+                photo.content_hash, photo.phash = form.fingerprint
+                if form.duplicate_of:
+                    reuse_image(photo, form.duplicate_of)
+                    image_changed = False
+                else:
+                    # The old renditions don't match the new file; show the original until they are rebuilt.
+                    photo.image_widths = []
+                    photo.processing_status = Photo.PROCESSING_PENDING
+            photo.save()
+            form.save_m2m()
+            if image_changed:
+                enqueue('photo.process', photo_id=photo.id)
             messages.success(request, 'Photo updated successfully!')
             return redirect('userApp:photo_detail', photo_id=photo.id)
     else:
-        form = PhotoUploadForm(instance=photo)
+        form = PhotoUploadForm(instance=photo, photographer=request.user)
     
     # SEO context
     seo_context = {
@@ -255,26 +407,65 @@ def photo_delete(request, photo_id):
 
 @require_POST
 @login_required
-def like_photo(request, photo_id):
+async def like_photo(request, photo_id):
     """Like/unlike a photo"""
-    photo = get_object_or_404(Photo, id=photo_id)
-    
-    if request.user in photo.likes.all():
-        photo.likes.remove(request.user)
-        liked = False
-    else:
-        photo.likes.add(request.user)
-        liked = True
+    user = await request.auser()
+    try:
+        liked, like_count = await sync_to_async(toggle_like)(user.pk, photo_id)
+    except Photo.DoesNotExist:
+        raise Http404('Photo not found')
     
     return JsonResponse({
         'liked': liked,
-        'likes_count': photo.likes.count()
+        'likes_count': like_count
+    })
+
+def _photo_ids(values):
+    """Parse up to MAX_BULK_IDS photo ids; raises ValueError on bad input"""
+    if isinstance(values, str):
+        values = [value for value in values.split(',') if value.strip()]
+    ids = [int(value) for value in values]
+    if len(ids) > MAX_BULK_IDS:
+        raise ValueError(f'At most {MAX_BULK_IDS} photo ids per request')
+    return ids
+
+@require_GET
+async def liked_photos(request):
+    """Which of the photos in ?ids=1,2,3 the current user has liked (for a whole grid at once)"""
+    try:
+        photo_ids = _photo_ids(request.GET.get('ids', ''))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    user = await request.auser()
+    if not user.is_authenticated or not photo_ids:
+        return JsonResponse({'liked': []})
+    
+    liked = Like.objects.filter(customuser_id=user.pk, photo_id__in=photo_ids).values_list('photo_id', flat=True)
+    return JsonResponse({'liked': sorted([photo_id async for photo_id in liked])})
+
+@require_POST
+@login_required
+async def bulk_like(request):
+    """Idempotently like/unlike many photos: {"like": [ids], "unlike": [ids]}"""
+    try:
+        data = json.loads(request.body or b'{}')
+        like_ids = _photo_ids(data.get('like', []))
+        unlike_ids = _photo_ids(data.get('unlike', []))
+    except (ValueError, TypeError, AttributeError) as exc:
+        return JsonResponse({'error': f'Invalid request: {exc}'}, status=400)
+    
+    user = await request.auser()
+    like_counts = await sync_to_async(set_likes)(user.pk, like_ids, unlike_ids)
+    return JsonResponse({
+        'liked': sorted(photo_id for photo_id in like_ids if photo_id in like_counts and photo_id not in unlike_ids),
+        'like_counts': {str(photo_id): count for photo_id, count in like_counts.items()},
     })
 
 def user_profile(request, username):
     """Display user profile with their photos"""
     user = get_object_or_404(CustomUser, username=username)
-    photos = Photo.objects.filter(photographer=user, is_public=True).order_by('-created_at')
+    photos = Photo.objects.filter(photographer=user, is_public=True).for_grid(request.user).ranked('newest')
     
     # Check if current user is following this user
     is_following = False
@@ -282,9 +473,7 @@ def user_profile(request, username):
         is_following = Follow.objects.filter(follower=request.user, following=user).exists()
     
     # Pagination for photos
-    paginator = Paginator(photos, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, photos, PhotoQuerySet.sort_ordering('newest'))
     
     # SEO context
     seo_context = {
@@ -305,9 +494,11 @@ def user_profile(request, username):
         'profile_user': user,
         'page_obj': page_obj,
         'is_following': is_following,
-        'followers_count': user.followers.count(),
-        'following_count': user.following.count(),
-        'photos_count': photos.count(),
+        'followers_count': user.follower_count,
+        'following_count': user.following_count,
+        # Keyset pages only serve sets too large to count on every request.
+        'photos_count': None if getattr(page_obj, 'is_keyset', False) else page_obj.paginator.count,
+        'photos_count_floor': getattr(settings, 'NUMBERED_PAGINATION_MAX_ITEMS', 1200),
         **seo_context,
     }
     return render(request, 'userApp/user_profile.html', context)
@@ -318,12 +509,12 @@ def user_photos(request, username):
     if request.user.username != username:
         return redirect('userApp:user_profile', username=username)
     
-    photos = Photo.objects.filter(photographer=request.user).order_by('-created_at')
+    photos = Photo.objects.filter(photographer=request.user).for_grid(request.user).ranked('newest')
     
     # Pagination
-    paginator = Paginator(photos, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, photos, PhotoQuerySet.sort_ordering('newest'))
+    # Keyset pages only serve sets too large to count on every request.
+    photos_count = None if getattr(page_obj, 'is_keyset', False) else page_obj.paginator.count
     
     # SEO context
     seo_context = {
@@ -340,6 +531,8 @@ def user_photos(request, username):
     
     context = {
         'page_obj': page_obj,
+        'photos_count': photos_count,
+        'photos_count_floor': getattr(settings, 'NUMBERED_PAGINATION_MAX_ITEMS', 1200),
         **seo_context,
     }
     return render(request, 'userApp/user_photos.html', context)
@@ -350,7 +543,12 @@ def profile_edit(request):
     if request.method == 'POST':
         form = UserProfileForm(request.POST, request.FILES, instance=request.user)
         if form.is_valid():
-            form.save()
+            image_changed = 'profile_image' in form.changed_data
+            if image_changed:
+                form.instance.profile_image_widths = []
+            user = form.save()
+            if image_changed:
+                enqueue('user.profile_image', user_id=user.id)
             messages.success(request, 'Profile updated successfully!')
             # Check if user exists in database before redirecting
             try:
@@ -388,48 +586,42 @@ def profile_edit(request):
 
 @require_POST
 @login_required
-def follow_user(request, username):
+async def follow_user(request, username):
     """Follow/unfollow a user"""
-    user_to_follow = get_object_or_404(CustomUser, username=username)
-    
-    if request.user == user_to_follow:
+    user = await request.auser()
+    try:
+        is_following, followers_count = await sync_to_async(toggle_follow)(user.pk, username)
+    except CustomUser.DoesNotExist:
+        raise Http404('User not found')
+    except ValueError:
         return JsonResponse({'error': 'You cannot follow yourself'}, status=400)
     
-    follow_obj, created = Follow.objects.get_or_create(
-        follower=request.user,
-        following=user_to_follow
-    )
-    
-    if not created:
-        follow_obj.delete()
-        is_following = False
-    else:
-        is_following = True
-    
     return JsonResponse({
         'is_following': is_following,
-        'followers_count': user_to_follow.followers.count()
+        'followers_count': followers_count
     })
 
+@read_from_replica
+@cache_anonymous_page('albums', 'photos', 'users')
 def album_list(request):
     """Display all public albums"""
-    albums = Album.objects.filter(is_public=True)
+    # Cards render the stored mosaic, or the prefetched preview photos while
+    # it is being built; the count is denormalized.
+    albums = Album.objects.filter(is_public=True).select_related('photographer').prefetch_related(preview_prefetch())
     
     # Sorting
     sort_by = request.GET.get('sort', 'newest')
     if sort_by == 'oldest':
         albums = albums.order_by('created_at')
     elif sort_by == 'popular':
-        albums = albums.annotate(photo_count=Count('photos')).order_by('-photo_count', '-created_at')
+        albums = albums.order_by('-photo_count', '-created_at')
     elif sort_by == 'photos':
-        albums = albums.annotate(photo_count=Count('photos')).order_by('-photo_count', '-created_at')
+        albums = albums.order_by('-photo_count', '-created_at')
     else:  # newest
         albums = albums.order_by('-created_at')
     
     # Get statistics for the hero section
-    total_albums = Album.objects.filter(is_public=True).count()
-    total_photos = Photo.objects.filter(is_public=True).count()
-    photographers_count = CustomUser.objects.filter(photos__is_public=True).distinct().count()
+    stats = site_stats()
     
     # Pagination
     paginator = Paginator(albums, 9)
@@ -451,18 +643,31 @@ def album_list(request):
     
     context = {
         'page_obj': page_obj,
-        'total_albums': total_albums,
-        'total_photos': total_photos,
-        'photographers_count': photographers_count,
+        'total_albums': stats.public_albums,
+        'total_photos': stats.public_photos,
+        'photographers_count': stats.photographers,
         'sort_by': sort_by,
         **seo_context,
     }
     return render(request, 'userApp/album_list.html', context)
 
 def album_detail(request, album_id):
-    """Display album with its photos"""
-    album = get_object_or_404(Album, id=album_id, is_public=True)
-    photos = album.photos.filter(is_public=True)
+    """Display album with its photos, in album order"""
+    albums = Album.objects.select_related('photographer', 'cover_photo')
+    if request.user.is_authenticated:
+        album = get_object_or_404(albums.filter(Q(is_public=True) | Q(photographer=request.user)), id=album_id)
+    else:
+        album = get_object_or_404(albums, id=album_id, is_public=True)
+    is_owner = album.photographer_id == request.user.pk
+    photos = Photo.objects.all() if is_owner else Photo.objects.filter(is_public=True)
+    photos = photos.in_album(album).for_grid(request.user)
+    page_obj = paginate(request, photos, PhotoQuerySet.ALBUM_ORDERING)
+    if album.cover_photo and album.cover_photo.image:
+        cover_url = request.build_absolute_uri(album.cover_photo.image.url)
+    elif album.cover_mosaic:
+        cover_url = request.build_absolute_uri(album.cover_mosaic.url)
+    else:
+        cover_url = ''
     
     # SEO context
     seo_context = {
@@ -472,34 +677,100 @@ def album_detail(request, album_id):
         'og_title': f'{album.title} - Photo Album by {album.photographer.username} | PhotoShare',
         'og_description': f'View "{album.title}" photo album by {album.photographer.username}.',
         'og_type': 'website',
-        'og_image': request.build_absolute_uri(album.cover_photo.image.url) if album.cover_photo and album.cover_photo.image else '',
+        'og_image': cover_url,
         'twitter_title': f'{album.title} - Photo Album by {album.photographer.username} | PhotoShare',
         'twitter_description': f'View "{album.title}" photo album by {album.photographer.username}.',
-        'twitter_image': request.build_absolute_uri(album.cover_photo.image.url) if album.cover_photo and album.cover_photo.image else '',
+        'twitter_image': cover_url,
         'schema_type': 'ImageGallery',
     }
     
     context = {
         'album': album,
-        'photos': photos,
+        'page_obj': page_obj,
+        'is_owner': is_owner,
         **seo_context,
     }
     return render(request, 'userApp/album_detail.html', context)
 
+@require_POST
+@login_required
+def album_photos_update(request, album_id):
+    """Add, remove and reorder an album's photos: {"add": [ids], "remove": [ids], "order": [ids]}"""
+    album = get_object_or_404(Album, id=album_id, photographer=request.user)
+    try:
+        data = json.loads(request.body or b'{}')
+        add = _photo_ids(data.get('add', []))
+        remove = _photo_ids(data.get('remove', []))
+        order = _photo_ids(data.get('order', []))
+    except (ValueError, TypeError, AttributeError) as exc:
+        return JsonResponse({'error': f'Invalid request: {exc}'}, status=400)
+    
+    changes = update_album_photos(album, add, remove, order)
+    album.refresh_from_db(fields=['photo_count'])
+    return JsonResponse({**changes, 'photo_count': album.photo_count})
+
+@require_GET
+@login_required
+def album_photo_picker(request, album_id):
+    """JSON page of the owner's photos to pick from, searchable with ?q= and cursor-paginated"""
+    album = get_object_or_404(Album, id=album_id, photographer=request.user)
+    photos = own_photos(request.user, request.GET.get('q', ''))
+    photos = photos.annotate(in_album=Exists(AlbumPhoto.objects.filter(album=album, photo=OuterRef('pk'))))
+    ordering = PhotoQuerySet.sort_ordering('newest')
+    per_page = getattr(settings, 'ALBUM_PICKER_PER_PAGE', 24)
+    page_obj = KeysetPaginator(photos, per_page, ordering).get_page(request.GET.get('cursor'))
+    
+    return JsonResponse({
+        'results': [
+            {
+                'id': photo.id,
+                'title': photo.title,
+                'thumbnail': photo.image_renditions.small_url if photo.image else '',
+                'is_public': photo.is_public,
+                'in_album': photo.in_album,
+            }
+            for photo in page_obj
+        ],
+        'next_cursor': page_obj.next_cursor,
+    })
+
+@require_GET
+@login_required
+def photo_autocomplete(request):
+    """JSON page of the user's photos for the photo pickers of forms, searchable with ?q="""
+    photos = own_photos(request.user, request.GET.get('q', ''))
+    ordering = PhotoQuerySet.sort_ordering('newest')
+    per_page = getattr(settings, 'PHOTO_AUTOCOMPLETE_PER_PAGE', 20)
+    page_obj = KeysetPaginator(photos, per_page, ordering).get_page(request.GET.get('cursor'))
+    
+    return JsonResponse({
+        'results': [
+            {
+                'id': photo.id,
+                'title': photo.title,
+                'thumbnail': photo.image_renditions.small_url if photo.image else '',
+            }
+            for photo in page_obj
+        ],
+        'next_cursor': page_obj.next_cursor,
+    })
+
 @login_required
 def album_create(request):
     """Create new album"""
     if request.method == 'POST':
-        form = AlbumForm(request.POST)
+        form = AlbumForm(request.POST, photographer=request.user)
         if form.is_valid():
             album = form.save(commit=False)
             album.photographer = request.user
             album.save()
-            form.save_m2m()  # Save many-to-many relationships
+            # Keep the photos in the order they were picked.
+            chosen = {str(photo.pk) for photo in form.cleaned_data['photos']}
+            update_album_photos(album, add=[int(pk) for pk in dict.fromkeys(request.POST.getlist('photos')) if pk in chosen])
             messages.success(request, 'Album created successfully!')
             return redirect('userApp:album_detail', album_id=album.id)
     else:
-        form = AlbumForm()
+        form = AlbumForm(photographer=request.user)
     
     # SEO context
     seo_context = {
@@ -520,15 +791,18 @@ def album_create(request):
     }
     return render(request, 'userApp/album_create.html', context)
 
+@read_from_replica
+@cache_anonymous_page('photos', 'users', 'categories')
 def category_photos(request, category_id):
     """Display photos by category"""
     category = get_object_or_404(Category, id=category_id)
-    photos = Photo.objects.filter(category=category, is_public=True).order_by('-created_at')
+    sort_by = request.GET.get('sort', 'newest')
+    photos = Photo.objects.filter(category=category, is_public=True).for_grid(request.user).ranked(sort_by)
     
     # Pagination
-    paginator = Paginator(photos, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, photos, PhotoQuerySet.sort_ordering(sort_by))
+    # Only numbered pages know the total; keyset pages skip the COUNT(*).
+    photos_count = None if getattr(page_obj, 'is_keyset', False) else page_obj.paginator.count
     
     # SEO context
     seo_context = {
@@ -546,26 +820,53 @@ def category_photos(request, category_id):
     context = {
         'category': category,
         'page_obj': page_obj,
+        'photos_count': photos_count,
         **seo_context,
     }
     return render(request, 'userApp/category_photos.html', context)
 
+@read_from_replica
+def tag_photos(request, slug):
+    """Display public photos with a tag, cursor-paginated"""
+    tag = get_object_or_404(Tag, slug=slug)
+    sort_by = request.GET.get('sort', 'newest')
+    photos = tag.photos.filter(is_public=True).for_grid(request.user).ranked(sort_by)
+    
+    # Keyset pagination: tag pages are crawlable and can get deep
+    page_obj = KeysetPaginator(photos, 12, PhotoQuerySet.sort_ordering(sort_by)).get_page(request.GET.get('cursor'))
+    
+    # SEO context
+    seo_context = {
+        'meta_title': f'#{tag.name} Photos - PhotoShare',
+        'meta_description': f'Browse photos tagged {tag.name} on PhotoShare.',
+        'meta_keywords': f'{tag.name}, {tag.name} photos, {tag.name} photography, photo tags',
+        'og_title': f'#{tag.name} Photos - PhotoShare',
+        'og_description': f'Browse photos tagged {tag.name} on PhotoShare.',
+        'og_type': 'website',
+        'twitter_title': f'#{tag.name} Photos - PhotoShare',
+        'twitter_description': f'Browse photos tagged {tag.name} on PhotoShare.',
+        'schema_type': 'CollectionPage',
+    }
+    
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+        'sort_by': sort_by,
+        'popular_tags': [t for t in popular_tags(limit=21) if t['slug'] != tag.slug][:20],
+        **seo_context,
+    }
+    return render(request, 'userApp/tag_photos.html', context)
+
+@read_from_replica
 def search_results(request):
     """Search functionality"""
     query = request.GET.get('q', '')
     if query:
-        photos = Photo.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(tags__icontains=query) |
-            Q(photographer__username__icontains=query) |
-            Q(location__icontains=query)
-        ).filter(is_public=True).order_by('-created_at')
+        photos = Photo.objects.filter(is_public=True).for_grid(request.user)
+        photos = search_photos(photos, query, ranked=True).order_by(*RELEVANCE_ORDERING)
         
         # Pagination
-        paginator = Paginator(photos, 12)
-        page_number = request.GET.get('page')
-        page_obj = paginator.get_page(page_number)
+        page_obj = paginate(request, photos, RELEVANCE_ORDERING)
     else:
         page_obj = None
     
@@ -585,6 +886,7 @@ def search_results(request):
     context = {
         'query': query,
         'page_obj': page_obj,
+        'photos': page_obj,
         **seo_context,
     }
     return render(request, 'userApp/search_results.html', context)
@@ -720,13 +1022,12 @@ def password_reset_view(request):
     }
     return render(request, 'userApp/password_reset.html', context)
 
+@read_from_replica
+@cache_anonymous_page('photos', 'albums', 'users', 'categories')
 def sitemap(request):
     """Display site map with all navigation options"""
     # Get some statistics for the sitemap
-    total_photos = Photo.objects.filter(is_public=True).count()
-    total_users = CustomUser.objects.count()
-    total_albums = Album.objects.filter(is_public=True).count()
-    total_categories = Category.objects.count()
+    stats = site_stats()
     
     # SEO context
     seo_context = {
@@ -742,36 +1043,46 @@ def sitemap(request):
     }
     
     context = {
-        'total_photos': total_photos,
-        'total_users': total_users,
-        'total_albums': total_albums,
-        'total_categories': total_categories,
+        'total_photos': stats.public_photos,
+        'total_users': stats.users,
+        'total_albums': stats.public_albums,
+        'total_categories': stats.categories,
         **seo_context,
     }
     return render(request, 'userApp/sitemap.html', context)
 
+def _sitemap_validators(request, section=None, page=None):
+    """ETag and Last-Modified for a sitemap response, computed once per request"""
+    if not hasattr(request, '_sitemap_validators'):
+        if section is None:
+            request._sitemap_validators = sitemaps.index_validators()
+        elif section in sitemaps.SECTIONS:
+            request._sitemap_validators = sitemaps.page_validators(sitemaps.SECTIONS[section], page)
+        else:
+            request._sitemap_validators = (None, None)
+    return request._sitemap_validators
+
+@condition(
+    etag_func=lambda request, **kwargs: _sitemap_validators(request, **kwargs)[0],
+    last_modified_func=lambda request, **kwargs: _sitemap_validators(request, **kwargs)[1],
+)
 def sitemap_xml(request):
-    """Generate XML sitemap for search engines"""
-    # Get all public photos, albums, categories, and users
-    photos = Photo.objects.filter(is_public=True).order_by('-created_at')
-    albums = Album.objects.filter(is_public=True).order_by('-created_at')
-    categories = Category.objects.all()
-    users = CustomUser.objects.filter(photos__is_public=True).distinct()
-    
-    # Base URL
+    """Sitemap index pointing at the paginated per-section sitemaps"""
     base_url = request.build_absolute_uri('/')[:-1]  # Remove trailing slash
-    
-    # Generate sitemap XML
-    xml_content = render_to_string('userApp/sitemap.xml', {
-        'base_url': base_url,
-        'photos': photos,
-        'albums': albums,
-        'categories': categories,
-        'users': users,
-        'lastmod': timezone.now().strftime('%Y-%m-%d'),
-    })
-    
-    return HttpResponse(xml_content, content_type='application/xml')
+    return StreamingHttpResponse(sitemaps.stream_index(base_url), content_type='application/xml')
+
+@condition(
+    etag_func=lambda request, **kwargs: _sitemap_validators(request, **kwargs)[0],
+    last_modified_func=lambda request, **kwargs: _sitemap_validators(request, **kwargs)[1],
+)
+def sitemap_section(request, section, page):
+    """One page of a section sitemap, streamed row by row"""
+    if section not in sitemaps.SECTIONS or _sitemap_validators(request, section, page) == (None, None):
+        raise Http404('No such sitemap')
+    base_url = request.build_absolute_uri('/')[:-1]
+    return StreamingHttpResponse(
+        sitemaps.stream_section(sitemaps.SECTIONS[section], page, base_url), content_type='application/xml',
+    )
 
 def robots_txt(request):
     """Generate robots.txt file"""
@@ -0,0 +1,36 @@
+"""
+Entry points for task-queue worker processes.
+
+Worker processes are spawned from a clean interpreter and unpickle these
+functions before Django is configured, so this module must not import
+models at module level.
+"""
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def execute(task_id):
+    from django.db import connections
+
+    from .tasks import run_task
+    try:
+        return run_task(task_id)
+    finally:
+        connections.close_all()
+
+
+def read_stored_exif(photo_id, name):
+    """``(photo_id, EXIF field values)`` of a stored image, for ``manage.py extract_exif``"""
+    from django.core.files.storage import default_storage
+    from PIL import Image
+
+    from .exif import read_exif
+    try:
+        with default_storage.open(name, 'rb') as fh:
+            with Image.open(fh) as image:
+                return photo_id, read_exif(image)
+    except (OSError, ValueError, SyntaxError):
+        return photo_id, None